@@ -0,0 +1,91 @@
+"""Análises de um grupo: atividade no tempo, autores, categorias e distribuição de notas.
+
+Os dados do grupo vêm de uma única consulta colunar (pd.read_sql com tipos definidos) e as
+agregações são feitas de forma vetorizada pelo pandas. O resultado fica em cache até a
+próxima escrita no grupo, detectada pela coluna version de group_stats.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from utils import connection, group_version
+
+ANALYTICS_CACHE_ENTRIES = 32
+TOP_AUTHORS = 10
+
+_lock = threading.Lock()
+_cache = OrderedDict()
+
+# Nota NULL conta como 0, como em group_stats (e não cabe em int8)
+GROUP_FRAME_SQL = (
+    "SELECT created_at, author, category, COALESCE(rating, 0) AS rating, likes, dislikes "
+    "FROM recommendations WHERE group_id = ?"
+)
+
+GROUP_FRAME_DTYPES = {
+    "author": "category",
+    "category": "category",
+    "rating": "int8",
+    "likes": "int32",
+    "dislikes": "int32"
+}
+
+def load_group_frame(conn, group_id):
+    """Recomendações de um grupo como DataFrame tipado (uma consulta)"""
+    frame = pd.read_sql(GROUP_FRAME_SQL, conn, params=(group_id,), dtype=GROUP_FRAME_DTYPES)
+    frame["created_at"] = pd.to_datetime(frame["created_at"], format="ISO8601", errors="coerce")
+    return frame
+
+def _summarize(frame):
+    """Agregações do painel, todas vetorizadas"""
+    balance = frame["likes"].astype("int64") - frame["dislikes"]
+
+    activity = frame["created_at"].dt.floor("D").value_counts().sort_index()
+    activity = activity.rename_axis("Dia").rename("Indicações")
+
+    authors = (
+        frame.assign(saldo=balance)
+        .groupby("author", observed=True)
+        .agg(indicacoes=("rating", "size"), saldo=("saldo", "sum"), media=("rating", "mean"))
+        .nlargest(TOP_AUTHORS, ["indicacoes", "saldo"])
+        .rename(columns={"indicacoes": "Indicações", "saldo": "Saldo Likes", "media": "Média Avaliação"})
+        .rename_axis("Autor")
+    )
+
+    categories = frame["category"].value_counts()
+    categories = categories[categories > 0].rename_axis("Categoria").rename("Indicações")
+
+    ratings = np.bincount(frame["rating"].clip(0, 5).to_numpy(), minlength=6)[1:]
+    ratings = pd.Series(ratings, index=pd.Index(range(1, 6), name="Nota"), name="Indicações")
+
+    return {
+        "total": len(frame),
+        "activity": activity,
+        "authors": authors,
+        "categories": categories,
+        "ratings": ratings
+    }
+
+def get_group_analytics(group_id):
+    """Painel de análises de um grupo; recalculado só quando o grupo muda"""
+    try:
+        with connection() as conn:
+            version = group_version(conn, group_id)
+            with _lock:
+                entry = _cache.get(group_id)
+                if entry is not None and entry[0] == version:
+                    _cache.move_to_end(group_id)
+                    return entry[1]
+            summary = _summarize(load_group_frame(conn, group_id))
+    except Exception as e:
+        print(f"⚠️  get_group_analytics: {e}")
+        return None
+
+    with _lock:
+        _cache[group_id] = (version, summary)
+        _cache.move_to_end(group_id)
+        while len(_cache) > ANALYTICS_CACHE_ENTRIES:
+            _cache.popitem(last=False)
+    return summary
@@ -1,9 +1,25 @@
 import streamlit as st
 import json
+import math
 import os
-import time
+import sqlite3
+import uuid
 from datetime import datetime
-from utils import load_data, save_data, save_user_preferred_group, get_user_preferred_group, get_user_last_group
+from utils import (
+    bootstrap,
+    insert_row, update_row, toggle_vote, get_user, get_group, get_recommendation,
+    get_user_groups, get_public_groups, get_group_members, is_group_member, add_group_member,
+    create_group as create_group_row,
+    get_user_recommendations, get_user_recommendation_stats, get_group_feed, count_group_recommendations,
+    get_group_categories, get_group_stats, FEED_PAGE_SIZE,
+    save_user_preferred_group, get_user_preferred_group, get_user_last_group
+)
+from recommender import get_for_you, apply_vote
+from analytics import get_group_analytics
+from auth import (
+    AuthBusy, check_password, make_password, needs_rehash,
+    login_keys, login_allowed, record_login_failure, record_login_success
+)
 
 # Configuração da página
 st.set_page_config(
@@ -12,6 +28,9 @@ st.set_page_config(
     layout="wide"
 )
 
+# Prepara o banco uma única vez por processo (reruns não tocam no esquema)
+bootstrap()
+
 # Função compatível para rerun
 def rerun():
     """Função compatível para rerun em todas versões do Streamlit"""
@@ -20,6 +39,10 @@ def rerun():
     except AttributeError:
         st.experimental_rerun()
 
+# Reexecução parcial: só o fragmento roda de novo quando um widget dele muda
+# (st.fragment a partir do 1.37, st.experimental_fragment no 1.33; antes disso roda tudo)
+fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda func: func)
+
 # Sistema de autenticação simples
 def init_session_state():
     """Inicializa o estado da sessão"""
@@ -37,6 +60,10 @@ def init_session_state():
         st.session_state.show_registration_success = False
     if 'login_tab' not in st.session_state:
         st.session_state.login_tab = "Login"
+    if 'selected_recommendation' not in st.session_state:
+        st.session_state.selected_recommendation = None
+    if 'session_id' not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
 
 init_session_state()
 
@@ -44,48 +71,53 @@ init_session_state()
 
 def register_user(username, password):
     """Registra um novo usuário com estrutura atualizada"""
-    users = load_data("users.json", {})
-
-    if username in users:
+    if get_user(username):
         return False, "Usuário já existe"
 
+    try:
+        password_hash = make_password(password)
+    except AuthBusy as e:
+        return False, f"{e}. Tente novamente em instantes."
+
     # Estrutura completa do usuário
-    users[username] = {
-        "password": password,
+    new_user = {
+        "username": username,
+        "password": password_hash,
         "created_at": datetime.now().isoformat(),
         "preferred_group": None,
         "last_group": None
     }
-    save_data("users.json", users)
+    if insert_row("users", new_user) is None:
+        return False, "Não foi possível registrar o usuário"
     return True, "Usuário registrado com sucesso!"
 
 def login_user(username, password):
-    """Faz login do usuário com compatibilidade retroativa"""
-    users = load_data("users.json", {})
+    """Faz login do usuário"""
+    # Limite de tentativas em memória: excesso é recusado antes de consultar o banco
+    keys = login_keys(username, st.session_state.session_id)
+    allowed, retry_after = login_allowed(*keys)
+    if not allowed:
+        return False, f"Muitas tentativas. Tente novamente em {math.ceil(retry_after)} s"
 
-    if username not in users:
-        return False, "Usuário não encontrado"
+    user_data = get_user(username)
 
-    # Suporte para estrutura antiga (senha direta) e nova (dicionário)
-    user_data = users[username]
-
-    # Se user_data é string (estrutura antiga), é a senha diretamente
-    if isinstance(user_data, str):
-        stored_password = user_data
-        # Atualiza para nova estrutura
-        users[username] = {
-            "password": stored_password,
-            "created_at": datetime.now().isoformat(),
-            "preferred_group": None,
-            "last_group": None
-        }
-        save_data("users.json", users)
-        user_data = users[username]
-
-    # Verifica senha
-    if user_data.get("password") != password:
-        return False, "Senha incorreta"
+    if not user_data:
+        record_login_failure(*keys)
+        return False, "Usuário não encontrado"
 
+    # Verifica senha (scrypt no pool de autenticação)
+    stored = user_data.get("password")
+    try:
+        if not check_password(password, stored):
+            record_login_failure(*keys)
+            return False, "Senha incorreta"
+        # Senha antiga em texto puro ou com custo desatualizado: regrava com o hash atual
+        if needs_rehash(stored):
+            update_row("users", username, {"password": make_password(password)})
+    except AuthBusy as e:
+        return False, f"{e}. Tente novamente em instantes."
+
+    record_login_success(*keys)
     st.session_state.authenticated = True
     st.session_state.username = username
     st.session_state.show_registration_success = False
@@ -93,14 +125,10 @@ def login_user(username, password):
     # Restaura o último grupo do usuário
     last_group = user_data.get("last_group")
     if last_group:
-        groups = load_data("groups.json", [])
-        group_exists = any(g.get("id") == last_group for g in groups)
-
-        if group_exists:
-            # Verifica se usuário ainda é membro
-            target_group = next((g for g in groups if g.get("id") == last_group), None)
-            if target_group and username in target_group.get("members", []):
-                st.session_state.current_group = last_group
+        # Verifica se o usuário ainda é membro do grupo
+        if is_group_member(last_group, username):
+            st.session_state.current_group = last_group
+            if user_data.get("preferred_group") != last_group:
                 save_user_preferred_group(username, last_group)
 
     return True, "Login bem-sucedido!"
@@ -113,83 +141,51 @@ def logout():
     st.session_state.page = "home"
     st.session_state.show_group_details = False
     st.session_state.show_registration_success = False
-    rerun()
 
 # ==================== FUNÇÕES PARA GRUPOS ====================
 
-def create_group(group_name, description, categories):
+def create_group(group_name, description, categories, is_public=True):
     """Cria um novo grupo com estrutura consistente"""
-    groups = load_data("groups.json", [])
-
-    # Verifica se grupo já existe
-    for group in groups:
-        if group.get("name", "").lower() == group_name.lower():
-            return False, "Já existe um grupo com este nome"
-
-    # Cria ID único
-    existing_ids = [g.get("id", 0) for g in groups if "id" in g]
-    new_id = max(existing_ids) + 1 if existing_ids else 1
-
-    new_group = {
-        "id": new_id,
-        "name": group_name,
-        "description": description,
-        "categories": categories,
-        "created_by": st.session_state.username,
-        "created_at": datetime.now().isoformat(),
-        "members": [st.session_state.username],
-        "is_public": True
-    }
-
-    groups.append(new_group)
-    save_data("groups.json", groups)
-
-    # Atualiza grupo atual e salva preferência
+    try:
+        # Id e unicidade do nome (sem diferenciar maiúsculas) ficam a cargo do SQLite
+        new_id = create_group_row(group_name, description, categories, st.session_state.username, is_public)
+    except sqlite3.IntegrityError:
+        return False, "Já existe um grupo com este nome"
+    except Exception as e:
+        print(f"❌ Erro ao criar grupo: {e}")
+        return False, "Não foi possível criar o grupo"
+
+    # Atualiza grupo atual (a preferência já foi salva junto com o grupo)
     st.session_state.current_group = new_id
-    save_user_preferred_group(st.session_state.username, new_id)
 
     return True, "Grupo criado com sucesso! Você já está dentro dele."
 
 def join_group(group_id):
     """Entra em um grupo existente com tratamento seguro"""
-    groups = load_data("groups.json", [])
-
-    for group in groups:
-        if group.get("id") == group_id:
-            # Garante que existe campo members
-            if "members" not in group:
-                group["members"] = []
+    group = get_group(group_id)
+    if not group:
+        return False, "Grupo não encontrado"
 
-            if st.session_state.username not in group["members"]:
-                group["members"].append(st.session_state.username)
-                save_data("groups.json", groups)
+    if not add_group_member(group_id, st.session_state.username):
+        return False, "Você já está neste grupo"
 
-                # Atualiza grupo atual e salva preferência
-                st.session_state.current_group = group_id
-                save_user_preferred_group(st.session_state.username, group_id)
-
-                return True, f"Entrou no grupo '{group.get('name', 'Sem nome')}'!"
-            return False, "Você já está neste grupo"
+    # Atualiza grupo atual e salva preferência
+    st.session_state.current_group = group_id
+    save_user_preferred_group(st.session_state.username, group_id)
 
-    return False, "Grupo não encontrado"
+    return True, f"Entrou no grupo '{group.get('name', 'Sem nome')}'!"
 
 # ==================== FUNÇÕES PARA RECOMENDAÇÕES ====================
 
 def add_recommendation(title, description, category, rating, tags=""):
     """Adiciona uma nova recomendação com estrutura completa"""
-    recommendations = load_data("recommendations.json", [])
-
-    # Cria ID único
-    existing_ids = [r.get("id", 0) for r in recommendations if "id" in r]
-    new_id = max(existing_ids) + 1 if existing_ids else 1
-
     # Processa tags
     tag_list = []
     if tags:
         tag_list = [tag.strip() for tag in tags.split(",") if tag.strip()]
 
+    # O id é gerado pelo SQLite (AUTOINCREMENT)
     new_rec = {
-        "id": new_id,
         "title": title,
         "description": description,
         "category": category,
@@ -204,112 +200,94 @@ def add_recommendation(title, description, category, rating, tags=""):
         "disliked_by": []
     }
 
-    recommendations.append(new_rec)
-    save_data("recommendations.json", recommendations)
+    if insert_row("recommendations", new_rec) is None:
+        return False, "Não foi possível salvar a recomendação"
     return True, "Recomendação adicionada com sucesso!"
 
-def get_group_recommendations(group_id):
-    """Obtém recomendações de um grupo específico com fallback"""
-    recommendations = load_data("recommendations.json", [])
-
-    # Filtra por grupo_id e garante estrutura
-    filtered = []
-    for rec in recommendations:
-        # Se não tem group_id, pula (recomendação inválida)
-        if "group_id" not in rec:
-            continue
-
-        if rec["group_id"] == group_id:
-            # Garante campos obrigatórios
-            if "dislikes" not in rec:
-                rec["dislikes"] = 0
-            if "disliked_by" not in rec:
-                rec["disliked_by"] = []
-            if "likes" not in rec:
-                rec["likes"] = 0
-            if "liked_by" not in rec:
-                rec["liked_by"] = []
-
-            filtered.append(rec)
-
-    return filtered
-
-def get_user_recommendations(username):
-    """Obtém recomendações de um usuário específico"""
-    recommendations = load_data("recommendations.json", [])
-    return [rec for rec in recommendations if rec.get("author") == username]
-
 def like_recommendation(rec_id):
     """Adiciona like a uma recomendação com sistema toggle"""
-    recommendations = load_data("recommendations.json", [])
-
-    for rec in recommendations:
-        if rec.get("id") == rec_id:
-            username = st.session_state.username
-
-            # Garante campos existem
-            if "likes" not in rec:
-                rec["likes"] = 0
-            if "liked_by" not in rec:
-                rec["liked_by"] = []
-            if "dislikes" not in rec:
-                rec["dislikes"] = 0
-            if "disliked_by" not in rec:
-                rec["disliked_by"] = []
-
-            # Sistema toggle: like/dislike são mutuamente exclusivos
-            if username in rec["liked_by"]:
-                # Remove like
-                rec["likes"] -= 1
-                rec["liked_by"].remove(username)
-            else:
-                # Adiciona like, remove dislike se existir
-                if username in rec["disliked_by"]:
-                    rec["dislikes"] -= 1
-                    rec["disliked_by"].remove(username)
-
-                rec["likes"] += 1
-                rec["liked_by"].append(username)
-
-            save_data("recommendations.json", recommendations)
-            return True
-    return False
+    # Like/dislike são mutuamente exclusivos; o toggle acontece numa transação do SQLite
+    if not toggle_vote(rec_id, st.session_state.username, 1):
+        return False
+    apply_vote(rec_id, st.session_state.username)
+    return True
 
 def dislike_recommendation(rec_id):
     """Adiciona dislike a uma recomendação com sistema toggle"""
-    recommendations = load_data("recommendations.json", [])
-
-    for rec in recommendations:
-        if rec.get("id") == rec_id:
-            username = st.session_state.username
-
-            # Garante campos existem
-            if "dislikes" not in rec:
-                rec["dislikes"] = 0
-            if "disliked_by" not in rec:
-                rec["disliked_by"] = []
-            if "likes" not in rec:
-                rec["likes"] = 0
-            if "liked_by" not in rec:
-                rec["liked_by"] = []
-
-            # Sistema toggle: like/dislike são mutuamente exclusivos
-            if username in rec["disliked_by"]:
-                # Remove dislike
-                rec["dislikes"] -= 1
-                rec["disliked_by"].remove(username)
-            else:
-                # Adiciona dislike, remove like se existir
-                if username in rec["liked_by"]:
-                    rec["likes"] -= 1
-                    rec["liked_by"].remove(username)
-
-                rec["dislikes"] += 1
-                rec["disliked_by"].append(username)
+    if not toggle_vote(rec_id, st.session_state.username, -1):
+        return False
+    apply_vote(rec_id, st.session_state.username)
+    return True
+
+# ==================== CALLBACKS DOS BOTÕES ====================
+# Rodam antes do rerun disparado pelo clique, então a tela já sai atualizada sem sleep nem rerun extra
+
+# Opções do menu de navegação e a página de cada uma
+MENU_PAGES = {
+    "🏠 Início": "home",
+    "👥 Grupos": "groups",
+    "📝 Nova Indicação": "new_recommendation",
+    "⭐ Minhas Indicações": "my_recommendations",
+    "📈 Análises": "analytics"
+}
+
+def go_to_page(page):
+    st.session_state.page = page
+
+def select_group(group_id, page=None):
+    """Troca o grupo atual e salva a preferência do usuário"""
+    st.session_state.current_group = group_id
+    st.session_state.selected_recommendation = None
+    if page:
+        st.session_state.page = page
+    if group_id:
+        save_user_preferred_group(st.session_state.username, group_id)
+
+def select_group_by_name(group_ids):
+    """Callback do seletor de grupos do sidebar"""
+    select_group(group_ids.get(st.session_state.group_selector))
+
+def select_recommendation(rec_id):
+    st.session_state.selected_recommendation = rec_id
+
+def vote(rec_id, value):
+    """Like (1) ou dislike (-1) com toggle"""
+    voted = like_recommendation(rec_id) if value == 1 else dislike_recommendation(rec_id)
+    if not voted:
+        st.toast("Não foi possível registrar a interação", icon="⚠️")
+
+def join_group_clicked(group_id):
+    success, message = join_group(group_id)
+    st.toast(message, icon="✅" if success else "⚠️")
+
+def toggle_group_details():
+    st.session_state.show_group_details = not st.session_state.show_group_details
+
+def create_group_submitted():
+    """Callback do formulário de criação de grupo (lê os widgets pelas chaves)"""
+    state = st.session_state
+    if not (state.new_group_name and state.new_group_description and state.new_group_categories):
+        st.toast("Preencha todos os campos obrigatórios (*)", icon="⚠️")
+        return
+    success, message = create_group(state.new_group_name, state.new_group_description,
+                                    state.new_group_categories, state.new_group_public)
+    st.toast(message, icon="✅" if success else "⚠️")
+
+def recommendation_submitted():
+    """Callback do formulário de nova indicação; publicada, volta para o início"""
+    state = st.session_state
+    if not (state.new_rec_title and state.new_rec_description):
+        st.toast("Preencha os campos obrigatórios (*)", icon="⚠️")
+        return
+    success, message = add_recommendation(state.new_rec_title, state.new_rec_description,
+                                          state.new_rec_category, state.new_rec_rating, state.new_rec_tags)
+    st.toast(message, icon="✅" if success else "⚠️")
+    if success:
+        state.page = "home"
 
-            save_data("recommendations.json", recommendations)
-            return True
-    return False
+def select_page_by_label():
+    """Callback do menu de navegação do sidebar"""
+    st.session_state.page = MENU_PAGES[st.session_state.menu_choice]
 
 # ==================== PÁGINA DE LOGIN/REGISTRO ====================
 
@@ -342,8 +320,7 @@ def login_page():
                 if username and password:
                     success, message = login_user(username, password)
                     if success:
-                        st.success(message)
-                        time.sleep(1)
+                        # A página de login já foi desenhada; o rerun troca para o app
                         rerun()
                     else:
                         st.error(message)
@@ -365,7 +342,6 @@ def login_page():
                             st.success(message)
                             st.session_state.show_registration_success = True
                             st.session_state.force_login_tab = True
-                            time.sleep(1)
                             rerun()
                         else:
                             st.error(message)
@@ -381,12 +357,115 @@ def login_page():
 
 # ==================== FUNÇÕES DE RENDERIZAÇÃO ====================
 
+def render_recommendation_details(rec_id):
+    """Renderiza uma recomendação completa, com os botões de voto"""
+    rec = get_recommendation(rec_id)
+
+    st.button("⬅️ Voltar para a lista", on_click=select_recommendation, args=(None,))
+
+    if not rec or rec.get("group_id") != st.session_state.current_group:
+        st.warning("Recomendação não encontrada neste grupo.")
+        return
+
+    likes = rec.get("likes", 0)
+    dislikes = rec.get("dislikes", 0)
+    st.subheader(f"⭐ {rec.get('rating', 0)}/5 | {rec.get('title', 'Sem título')}")
+    st.markdown(f"**Categoria:** {rec.get('category', 'Sem categoria')}")
+    st.markdown(f"**Descrição:** {rec.get('description', 'Sem descrição')}")
+    st.markdown(f"**Por:** {rec.get('author', 'Anônimo')}")
+    tags = rec.get("tags", [])
+    st.markdown(f"**Tags:** {', '.join(tags) if tags else 'Nenhuma'}")
+    created = rec.get("created_at", "")
+    st.markdown(f"**Data:** {created[:10] if created else 'Data desconhecida'}")
+    st.markdown(f"👍 {likes} | 👎 {dislikes} | 📊 {likes - dislikes}")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.button(f"👍 Like", key=f"like_{rec.get('id')}", on_click=vote, args=(rec.get('id'), 1))
+    with col2:
+        st.button(f"👎 Dislike", key=f"dislike_{rec.get('id')}", on_click=vote, args=(rec.get('id'), -1))
+
+@fragment
+def render_group_feed(group_id):
+    """Feed do grupo (ou a recomendação selecionada); filtros, páginas e votos reexecutam só este trecho"""
+    if st.session_state.selected_recommendation:
+        render_recommendation_details(st.session_state.selected_recommendation)
+        return
+
+    total_recommendations = count_group_recommendations(group_id)
+
+    if total_recommendations:
+        with st.expander("✨ Para você", expanded=True):
+            for_you = get_for_you(group_id, st.session_state.username)
+            if for_you:
+                st.caption("Indicações que quem curte o mesmo que você também curtiu")
+                for rec in for_you:
+                    st.markdown(f"⭐ {rec.get('rating', 0)}/5 | **{rec.get('title', 'Sem título')}** "
+                                f"| {rec.get('category', 'Sem categoria')} | por {rec.get('author', 'Anônimo')}")
+            else:
+                st.caption("Curta algumas indicações do grupo para receber sugestões personalizadas.")
+
+        st.subheader(f"📝 {total_recommendations} Recomendações")
+
+        # Filtros
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            categories = get_group_categories(group_id)
+            selected_category = st.selectbox("Filtrar por categoria", ["Todas"] + categories)
+        with col2:
+            sort_options = {
+                "Mais recentes": "recent",
+                "Em alta": "hot",
+                "Mais likes": "likes",
+                "Melhor avaliadas": "rating",
+                "Mais polêmicas": "controversial"
+            }
+            sort_by = st.selectbox("Ordenar por", list(sort_options))
+        with col3:
+            search_term = st.text_input("Buscar por título, descrição ou tags")
+
+        category_filter = selected_category if selected_category != "Todas" else None
+        if search_term:
+            st.caption("🔎 Resultados da busca ordenados por relevância")
+        total_filtered = count_group_recommendations(
+            group_id, category_filter, search_term
+        )
+        total_pages = max((total_filtered + FEED_PAGE_SIZE - 1) // FEED_PAGE_SIZE, 1)
+        page = 1
+        if total_pages > 1:
+            page = st.number_input(f"Página (de {total_pages})", min_value=1,
+                                   max_value=total_pages, value=1, step=1)
+
+        # Filtro, ordenação e paginação acontecem no SQLite
+        filtered_recs = get_group_feed(
+            group_id,
+            category=category_filter,
+            sort_by=sort_options[sort_by],
+            page=page,
+            search=search_term
+        )
+
+        # Lista compacta: uma linha por recomendação; o conteúdo completo fica na tela de detalhes
+        for rec in filtered_recs:
+            likes = rec.get("likes", 0)
+            dislikes = rec.get("dislikes", 0)
+            col1, col2 = st.columns([6, 1])
+            with col1:
+                st.markdown(f"⭐ {rec.get('rating', 0)}/5 | **{rec.get('title', 'Sem título')}** "
+                            f"| {rec.get('category', 'Sem categoria')} | 👍 {likes} | 👎 {dislikes} "
+                            f"| 📊 {likes - dislikes}")
+            with col2:
+                st.button("📋 Ver", key=f"details_{rec.get('id')}",
+                          on_click=select_recommendation, args=(rec.get('id'),))
+    else:
+        st.info("Nenhuma recomendação neste grupo ainda. Seja o primeiro a compartilhar!")
+        st.button("📝 Criar primeira recomendação", on_click=go_to_page, args=("new_recommendation",))
+
 def render_home_page():
     """Renderiza a página inicial"""
     st.title("Página Inicial")
 
-    groups = load_data("groups.json", [])
-    user_groups = [g for g in groups if st.session_state.username in g.get("members", [])]
+    user_groups = get_user_groups(st.session_state.username)
 
     if not st.session_state.current_group:
         if user_groups:
@@ -396,7 +475,7 @@ def render_home_page():
             with cols[0]:
                 st.metric("Grupos", len(user_groups))
             with cols[1]:
-                total_members = sum(len(g.get("members", [])) for g in user_groups)
+                total_members = sum(g.get("member_count", 0) for g in user_groups)
                 st.metric("Membros", total_members)
             with cols[2]:
                 if user_groups:
@@ -413,16 +492,12 @@ def render_home_page():
                         st.markdown(f"### {group.get('name', 'Sem nome')}")
                         desc = group.get('description', 'Sem descrição')
                         st.markdown(f"📝 {desc[:100]}..." if len(desc) > 100 else f"📝 {desc}")
-                        st.markdown(f"👥 {len(group.get('members', []))} membros")
+                        st.markdown(f"👥 {group.get('member_count', 0)} membros")
                         categories = group.get('categories', [])
                         st.markdown(f"🏷️ {', '.join(categories[:3])}")
 
-                        if st.button(f"Entrar", key=f"enter_{group.get('id', idx)}"):
-                            st.session_state.current_group = group.get("id")
-                            save_user_preferred_group(st.session_state.username, group.get("id"))
-                            st.success("Entrou no grupo!")
-                            time.sleep(1)
-                            rerun()
+                        st.button(f"Entrar", key=f"enter_{group.get('id', idx)}",
+                                  on_click=select_group, args=(group.get("id"),))
 
             st.markdown("---")
         else:
@@ -438,111 +513,39 @@ def render_home_page():
 
             col1, col2 = st.columns(2)
             with col1:
-                if st.button("👥 Explorar Grupos", use_container_width=True):
-                    st.session_state.page = "groups"
-                    rerun()
+                st.button("👥 Explorar Grupos", use_container_width=True,
+                          on_click=go_to_page, args=("groups",))
             with col2:
-                if st.button("🚀 Criar Meu Grupo", use_container_width=True):
-                    st.session_state.page = "create_group"
-                    rerun()
+                st.button("🚀 Criar Meu Grupo", use_container_width=True,
+                          on_click=go_to_page, args=("groups",))
 
     else:
         # Tem grupo selecionado
-        current_group = next((g for g in groups if g.get("id") == st.session_state.current_group), None)
+        current_group = get_group(st.session_state.current_group)
 
         if current_group:
             col1, col2 = st.columns([3, 1])
             with col1:
                 st.header(f"📚 Recomendações em {current_group.get('name', 'Sem nome')}")
             with col2:
-                if st.button("🔄 Trocar Grupo"):
-                    st.session_state.current_group = None
-                    rerun()
+                st.button("🔄 Trocar Grupo", on_click=select_group, args=(None,))
 
             with st.expander(f"ℹ️ Sobre o grupo {current_group.get('name', 'Sem nome')}"):
                 st.markdown(f"**Descrição:** {current_group.get('description', 'Sem descrição')}")
                 st.markdown(f"**Criado por:** {current_group.get('created_by', 'Desconhecido')}")
-                st.markdown(f"**Membros:** {', '.join(current_group.get('members', []))}")
+                st.markdown(f"**Membros:** {', '.join(get_group_members(current_group.get('id')))}")
                 st.markdown(f"**Categorias:** {', '.join(current_group.get('categories', []))}")
 
-            recommendations = get_group_recommendations(st.session_state.current_group)
-
-            if recommendations:
-                st.subheader(f"📝 {len(recommendations)} Recomendações")
-
-                # Filtros
+                group_stats = get_group_stats(current_group.get('id'))
                 col1, col2, col3 = st.columns(3)
                 with col1:
-                    categories = list(set([r.get("category", "") for r in recommendations]))
-                    categories = [c for c in categories if c]
-                    selected_category = st.selectbox("Filtrar por categoria", ["Todas"] + categories)
+                    st.metric("Indicações", group_stats.get("total", 0))
                 with col2:
-                    sort_options = ["Mais recentes", "Mais likes", "Melhor avaliadas", "Mais polêmicas"]
-                    sort_by = st.selectbox("Ordenar por", sort_options)
+                    st.metric("Média Avaliação", f"{group_stats.get('avg_rating', 0):.1f}/5")
                 with col3:
-                    search_term = st.text_input("Buscar por título ou tags")
-
-                # Aplica filtros
-                filtered_recs = recommendations
-
-                if selected_category != "Todas":
-                    filtered_recs = [r for r in filtered_recs if r.get("category") == selected_category]
-
-                if search_term:
-                    search_term = search_term.lower()
-                    filtered_recs = [
-                        r for r in filtered_recs
-                        if search_term in r.get("title", "").lower() or
-                        any(search_term in tag.lower() for tag in r.get("tags", []))
-                    ]
-
-                # Ordena
-                if sort_by == "Mais recentes":
-                    filtered_recs.sort(key=lambda x: x.get("created_at", ""), reverse=True)
-                elif sort_by == "Mais likes":
-                    filtered_recs.sort(key=lambda x: x.get("likes", 0), reverse=True)
-                elif sort_by == "Melhor avaliadas":
-                    filtered_recs.sort(key=lambda x: x.get("rating", 0), reverse=True)
-                elif sort_by == "Mais polêmicas":
-                    filtered_recs.sort(key=lambda x: abs(x.get("likes", 0) - x.get("dislikes", 0)))
-
-                # Mostra recomendações
-                for rec in filtered_recs:
-                    likes = rec.get("likes", 0)
-                    dislikes = rec.get("dislikes", 0)
-                    saldo = likes - dislikes
-
-                    with st.expander(f"⭐ {rec.get('rating', 0)}/5 | {rec.get('title', 'Sem título')} | 👍 {likes} | 👎 {dislikes} | 📊 {saldo}"):
-                        st.markdown(f"**Categoria:** {rec.get('category', 'Sem categoria')}")
-                        st.markdown(f"**Descrição:** {rec.get('description', 'Sem descrição')}")
-                        st.markdown(f"**Por:** {rec.get('author', 'Anônimo')}")
-                        tags = rec.get("tags", [])
-                        st.markdown(f"**Tags:** {', '.join(tags) if tags else 'Nenhuma'}")
-                        created = rec.get("created_at", "")
-                        st.markdown(f"**Data:** {created[:10] if created else 'Data desconhecida'}")
-
-                        col1, col2, col3 = st.columns([1, 1, 2])
-                        with col1:
-                            if st.button(f"👍 Like", key=f"like_{rec.get('id')}"):
-                                if like_recommendation(rec.get('id')):
-                                    st.success("Interação registrada!")
-                                    time.sleep(0.5)
-                                    rerun()
-                        with col2:
-                            if st.button(f"👎 Dislike", key=f"dislike_{rec.get('id')}"):
-                                if dislike_recommendation(rec.get('id')):
-                                    st.success("Interação registrada!")
-                                    time.sleep(0.5)
-                                    rerun()
-                        with col3:
-                            if st.button("📋 Ver detalhes", key=f"details_{rec.get('id')}"):
-                                st.session_state.selected_recommendation = rec.get('id')
-                                rerun()
-            else:
-                st.info("Nenhuma recomendação neste grupo ainda. Seja o primeiro a compartilhar!")
-                if st.button("📝 Criar primeira recomendação"):
-                    st.session_state.page = "new_recommendation"
-                    rerun()
+                    st.metric("Saldo Likes", group_stats.get("likes", 0) - group_stats.get("dislikes", 0))
+
+            render_group_feed(current_group.get("id"))
 
 def render_groups_page():
     """Renderiza a página de grupos"""
@@ -551,8 +554,7 @@ def render_groups_page():
     tab1, tab2, tab3 = st.tabs(["Meus Grupos", "Explorar Grupos", "Criar Grupo"])
 
     with tab1:
-        groups = load_data("groups.json", [])
-        user_groups = [g for g in groups if st.session_state.username in g.get("members", [])]
+        user_groups = get_user_groups(st.session_state.username)
 
         if user_groups:
             st.subheader(f"👥 {len(user_groups)} Grupos")
@@ -569,31 +571,23 @@ def render_groups_page():
 
                     with col2:
                         st.markdown(f"**Criado por:** {group.get('created_by', 'Desconhecido')}")
-                        st.markdown(f"**Membros:** {len(group.get('members', []))}")
-                        st.markdown(f"**Recomendações:** {len(get_group_recommendations(group.get('id')))}")
+                        st.markdown(f"**Membros:** {group.get('member_count', 0)}")
+                        st.markdown(f"**Recomendações:** {count_group_recommendations(group.get('id'))}")
 
                     with col3:
                         if st.session_state.current_group == group.get("id"):
                             st.success("✅ Atual")
                         else:
-                            if st.button("Entrar", key=f"enter_{group.get('id')}"):
-                                st.session_state.current_group = group.get("id")
-                                save_user_preferred_group(st.session_state.username, group.get("id"))
-                                st.success(f"Entrou no grupo!")
-                                time.sleep(1)
-                                rerun()
+                            st.button("Entrar", key=f"enter_{group.get('id')}",
+                                      on_click=select_group, args=(group.get("id"),))
 
                     st.markdown("---")
         else:
             st.info("Você ainda não está em nenhum grupo")
-            if st.button("🔍 Explorar Grupos Públicos"):
-                st.session_state.page = "explore"
-                rerun()
+            st.button("🔍 Explorar Grupos Públicos", on_click=go_to_page, args=("explore",))
 
     with tab2:
-        groups = load_data("groups.json", [])
-        public_groups = [g for g in groups if g.get("is_public", True) and
-                        st.session_state.username not in g.get("members", [])]
+        public_groups = get_public_groups(st.session_state.username)
 
         if public_groups:
             st.subheader(f"🔍 {len(public_groups)} Grupos Públicos")
@@ -610,17 +604,11 @@ def render_groups_page():
 
                     with col2:
                         st.markdown(f"**Criado por:** {group.get('created_by', 'Desconhecido')}")
-                        st.markdown(f"**Membros:** {len(group.get('members', []))}")
+                        st.markdown(f"**Membros:** {group.get('member_count', 0)}")
 
                     with col3:
-                        if st.button("Participar", key=f"join_{group.get('id')}"):
-                            success, message = join_group(group.get("id"))
-                            if success:
-                                st.success(message)
-                                time.sleep(1)
-                                rerun()
-                            else:
-                                st.error(message)
+                        st.button("Participar", key=f"join_{group.get('id')}",
+                                  on_click=join_group_clicked, args=(group.get("id"),))
 
                     st.markdown("---")
         else:
@@ -629,30 +617,21 @@ def render_groups_page():
     with tab3:
         st.subheader("Criar Novo Grupo")
         with st.form("create_group_form"):
-            group_name = st.text_input("Nome do Grupo*")
-            description = st.text_area("Descrição do Grupo*")
+            st.text_input("Nome do Grupo*", key="new_group_name")
+            st.text_area("Descrição do Grupo*", key="new_group_description")
 
             default_categories = ["Filmes", "Séries", "Livros", "Produtos de Beleza",
                                 "Restaurantes", "Música", "Jogos", "Tecnologia"]
-            categories = st.multiselect(
+            st.multiselect(
                 "Categorias disponíveis no grupo*",
                 default_categories,
-                default=["Filmes", "Séries"]
+                default=["Filmes", "Séries"],
+                key="new_group_categories"
             )
 
-            is_public = st.checkbox("Grupo público", value=True)
+            st.checkbox("Grupo público", value=True, key="new_group_public")
 
-            if st.form_submit_button("Criar Grupo"):
-                if group_name and description and categories:
-                    success, message = create_group(group_name, description, categories)
-                    if success:
-                        st.success(message)
-                        time.sleep(1)
-                        rerun()
-                    else:
-                        st.error(message)
-                else:
-                    st.error("Preencha todos os campos obrigatórios (*)")
+            st.form_submit_button("Criar Grupo", on_click=create_group_submitted)
 
 def render_new_recommendation_page():
     """Renderiza a página de nova recomendação"""
@@ -661,46 +640,40 @@ def render_new_recommendation_page():
     if not st.session_state.current_group:
         st.warning("⚠️ Você precisa entrar em um grupo primeiro para fazer indicações")
 
-        groups = load_data("groups.json", [])
-        user_groups = [g for g in groups if st.session_state.username in g.get("members", [])]
+        user_groups = get_user_groups(st.session_state.username)
 
         if user_groups:
             st.info("Selecione um grupo:")
             for group in user_groups:
-                if st.button(f"📁 {group.get('name', 'Sem nome')}", key=f"select_for_rec_{group.get('id')}"):
-                    st.session_state.current_group = group.get("id")
-                    save_user_preferred_group(st.session_state.username, group.get("id"))
-                    rerun()
+                st.button(f"📁 {group.get('name', 'Sem nome')}", key=f"select_for_rec_{group.get('id')}",
+                          on_click=select_group, args=(group.get("id"),))
         else:
             st.info("Você não está em nenhum grupo ainda")
-            if st.button("👥 Ir para Grupos"):
-                st.session_state.page = "groups"
-                rerun()
+            st.button("👥 Ir para Grupos", on_click=go_to_page, args=("groups",))
 
         return
 
     # Se tem grupo selecionado
-    groups = load_data("groups.json", [])
-    current_group = next((g for g in groups if g.get("id") == st.session_state.current_group), None)
+    current_group = get_group(st.session_state.current_group)
 
     if current_group:
         with st.form("recommendation_form"):
             st.markdown(f"**Grupo atual:** {current_group.get('name', 'Sem nome')}")
 
-            title = st.text_input("Título da Indicação*")
-            description = st.text_area("Descrição detalhada*", height=150)
+            st.text_input("Título da Indicação*", key="new_rec_title")
+            st.text_area("Descrição detalhada*", height=150, key="new_rec_description")
 
             # Usar categorias do grupo
             categories = current_group.get("categories", [])
             if not categories:
                 categories = ["Geral"]
-            category = st.selectbox("Categoria*", categories)
+            st.selectbox("Categoria*", categories, key="new_rec_category")
 
             col1, col2 = st.columns(2)
             with col1:
-                rating = st.slider("Avaliação*", 1, 5, 5)
+                st.slider("Avaliação*", 1, 5, 5, key="new_rec_rating")
             with col2:
-                tags = st.text_input("Tags (separadas por vírgula)")
+                st.text_input("Tags (separadas por vírgula)", key="new_rec_tags")
 
             # Dicas
             with st.expander("💡 Dicas para uma boa recomendação"):
@@ -711,20 +684,7 @@ def render_new_recommendation_page():
                 - Use tags para facilitar a busca
                 """)
 
-            submitted = st.form_submit_button("📤 Publicar Indicação")
-
-            if submitted:
-                if title and description:
-                    success, message = add_recommendation(title, description, category, rating, tags)
-                    if success:
-                        st.success(message)
-                        time.sleep(1)
-                        st.session_state.page = "home"
-                        rerun()
-                    else:
-                        st.error(message)
-                else:
-                    st.error("Preencha os campos obrigatórios (*)")
+            st.form_submit_button("📤 Publicar Indicação", on_click=recommendation_submitted)
     else:
         st.error("Grupo não encontrado")
 
@@ -737,28 +697,23 @@ def render_my_recommendations_page():
     if recommendations:
         st.subheader(f"📊 {len(recommendations)} Recomendações Criadas")
 
-        # Estatísticas
+        # Estatísticas (agregadas no SQLite)
+        stats = get_user_recommendation_stats(st.session_state.username)
         col1, col2, col3, col4 = st.columns(4)
         with col1:
-            total_likes = sum(r.get("likes", 0) for r in recommendations)
-            total_dislikes = sum(r.get("dislikes", 0) for r in recommendations)
-            st.metric("Saldo Likes", f"{total_likes - total_dislikes}")
+            st.metric("Saldo Likes", f"{stats.get('likes', 0) - stats.get('dislikes', 0)}")
         with col2:
-            avg_rating = sum(r.get("rating", 0) for r in recommendations) / len(recommendations)
-            st.metric("Média Avaliação", f"{avg_rating:.1f}/5")
+            st.metric("Média Avaliação", f"{stats.get('avg_rating', 0):.1f}/5")
         with col3:
-            categories = len(set(r.get("category", "") for r in recommendations if r.get("category")))
-            st.metric("Categorias", categories)
+            st.metric("Categorias", stats.get("categories", 0))
         with col4:
-            groups = len(set(r.get("group_id") for r in recommendations if r.get("group_id")))
-            st.metric("Grupos", groups)
+            st.metric("Grupos", stats.get("groups", 0))
 
         st.markdown("---")
 
-        # Lista de recomendações
-        for rec in sorted(recommendations, key=lambda x: x.get("created_at", ""), reverse=True):
-            groups = load_data("groups.json", [])
-            group_name = next((g.get("name", "Grupo Desconhecido") for g in groups if g.get("id") == rec.get("group_id")), "Grupo Desconhecido")
+        # Lista de recomendações (já ordenada e com o nome do grupo)
+        for rec in recommendations:
+            group_name = rec.get("group_name") or "Grupo Desconhecido"
 
             likes = rec.get("likes", 0)
             dislikes = rec.get("dislikes", 0)
@@ -778,11 +733,8 @@ def render_my_recommendations_page():
                     st.markdown(f"**Dislikes:** {dislikes}")
 
                     # Botão para ir para o grupo
-                    if st.button("Ir para grupo", key=f"goto_{rec.get('id')}"):
-                        st.session_state.current_group = rec.get("group_id")
-                        save_user_preferred_group(st.session_state.username, rec.get("group_id"))
-                        st.session_state.page = "home"
-                        rerun()
+                    st.button("Ir para grupo", key=f"goto_{rec.get('id')}",
+                              on_click=select_group, args=(rec.get("group_id"), "home"))
     else:
         st.info("Você ainda não fez nenhuma indicação")
         st.markdown("""
@@ -796,12 +748,71 @@ def render_my_recommendations_page():
         - Livros que mudaram sua perspectiva
         """)
 
-        if st.button("📝 Fazer minha primeira indicação"):
-            st.session_state.page = "new_recommendation"
-            rerun()
+        st.button("📝 Fazer minha primeira indicação", on_click=go_to_page, args=("new_recommendation",))
 
 # ==================== PÁGINA PRINCIPAL DO APLICATIVO ====================
 
+def render_analytics_page():
+    """Renderiza o painel de análises do grupo atual"""
+    st.title("Análises do Grupo")
+
+    if not st.session_state.current_group:
+        st.warning("Selecione um grupo para ver as análises.")
+        return
+
+    current_group = get_group(st.session_state.current_group)
+    if not current_group:
+        st.error("Grupo não encontrado.")
+        return
+
+    st.header(f"📈 {current_group.get('name', 'Sem nome')}")
+    stats = get_group_stats(current_group.get("id"))
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Indicações", stats.get("total", 0))
+    with col2:
+        st.metric("Membros", stats.get("members", 0))
+    with col3:
+        st.metric("Média Avaliação", f"{stats.get('avg_rating', 0):.1f}/5")
+    with col4:
+        st.metric("Saldo Likes", stats.get("likes", 0) - stats.get("dislikes", 0))
+
+    analytics = get_group_analytics(current_group.get("id"))
+    if analytics is None:
+        st.error("Não foi possível carregar as análises.")
+        return
+    if not analytics["total"]:
+        st.info("Nenhuma recomendação neste grupo ainda.")
+        return
+
+    st.subheader("🗓️ Indicações por dia")
+    st.line_chart(analytics["activity"])
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader("🏷️ Categorias")
+        st.bar_chart(analytics["categories"])
+    with col2:
+        st.subheader("⭐ Distribuição das notas")
+        st.bar_chart(analytics["ratings"])
+
+    st.subheader("🏆 Autores mais ativos")
+    st.dataframe(analytics["authors"], use_container_width=True)
+
+@fragment
+def render_sidebar_group_info(group):
+    """Resumo do grupo atual no sidebar; o botão de detalhes reexecuta só este trecho"""
+    st.markdown(f"**Grupo:** {group.get('name', 'Sem nome')}")
+    st.markdown(f"**Membros:** {group.get('member_count', 0)}")
+    categories = group.get('categories', [])
+    st.markdown(f"**Categorias:** {', '.join(categories[:2])}")
+
+    st.button("📊 Ver detalhes do grupo", on_click=toggle_group_details)
+    if st.session_state.show_group_details:
+        st.markdown(f"**Descrição:** {group.get('description', 'Sem descrição')}")
+        st.markdown(f"**Criado por:** {group.get('created_by', 'Desconhecido')}")
+        st.markdown(f"**Todas as categorias:** {', '.join(categories)}")
+
 def main_app():
     st.sidebar.title(f"👋 Olá, {st.session_state.username}!")
 
@@ -809,8 +820,7 @@ def main_app():
     st.sidebar.markdown("---")
     st.sidebar.subheader("📁 Grupo Atual")
 
-    groups = load_data("groups.json", [])
-    user_groups = [g for g in groups if st.session_state.username in g.get("members", [])]
+    user_groups = get_user_groups(st.session_state.username)
 
     if user_groups:
         # Encontra o grupo atual
@@ -821,67 +831,35 @@ def main_app():
                 None
             )
 
-        # Lista de grupos para seleção
-        group_names = [g.get("name", "Sem nome") for g in user_groups]
-
-        # Índice do grupo atual na lista
-        current_index = 0
-        if current_group_info:
-            try:
-                current_index = group_names.index(current_group_info.get("name", "Sem nome"))
-            except ValueError:
-                current_index = 0
+        # Mantém o seletor em sincronia com trocas de grupo feitas em outras telas
+        group_ids = {g.get("name", "Sem nome"): g.get("id") for g in user_groups}
+        st.session_state.group_selector = current_group_info.get("name", "Sem nome") if current_group_info else None
 
-        # Dropdown para selecionar grupo
-        selected_group_name = st.sidebar.selectbox(
+        # Dropdown para selecionar grupo (a troca acontece no callback, antes do rerun)
+        st.sidebar.selectbox(
             "Selecione seu grupo:",
-            options=group_names,
-            index=current_index,
-            key="group_selector"
+            options=list(group_ids),
+            placeholder="Escolha um grupo",
+            key="group_selector",
+            on_change=select_group_by_name,
+            args=(group_ids,)
         )
 
-        # Atualiza quando selecionar diferente
-        if selected_group_name:
-            selected_group = next(g for g in user_groups if g.get("name") == selected_group_name)
-            if selected_group.get("id") != st.session_state.current_group:
-                st.session_state.current_group = selected_group.get("id")
-                save_user_preferred_group(st.session_state.username, selected_group.get("id"))
-                st.sidebar.success(f"Grupo '{selected_group_name}' selecionado!")
-                time.sleep(0.5)
-                rerun()
-
         # Mostra informações do grupo atual
         if current_group_info:
-            st.sidebar.markdown(f"**Grupo:** {current_group_info.get('name', 'Sem nome')}")
-            st.sidebar.markdown(f"**Membros:** {len(current_group_info.get('members', []))}")
-            categories = current_group_info.get('categories', [])
-            st.sidebar.markdown(f"**Categorias:** {', '.join(categories[:2])}")
-
-            # Botão para ver detalhes
-            if st.sidebar.button("📊 Ver detalhes do grupo"):
-                st.session_state.show_group_details = not st.session_state.show_group_details
-                rerun()
+            with st.sidebar:
+                render_sidebar_group_info(current_group_info)
     else:
         st.sidebar.warning("Você não está em nenhum grupo")
-        if st.sidebar.button("👥 Explorar grupos"):
-            st.session_state.page = "groups"
-            rerun()
+        st.sidebar.button("👥 Explorar grupos", on_click=go_to_page, args=("groups",))
 
     # Menu principal
     st.sidebar.markdown("---")
-    menu_options = ["🏠 Início", "👥 Grupos", "📝 Nova Indicação", "⭐ Minhas Indicações"]
-
-    # Atualiza página baseada na escolha
-    choice = st.sidebar.radio("Navegação", menu_options)
-
-    if choice == "🏠 Início":
-        st.session_state.page = "home"
-    elif choice == "👥 Grupos":
-        st.session_state.page = "groups"
-    elif choice == "📝 Nova Indicação":
-        st.session_state.page = "new_recommendation"
-    elif choice == "⭐ Minhas Indicações":
-        st.session_state.page = "my_recommendations"
+    # O menu segue a página atual, inclusive quando ela muda por um botão ou formulário
+    st.session_state.menu_choice = next(
+        label for label, page in MENU_PAGES.items() if page == st.session_state.page
+    )
+    st.sidebar.radio("Navegação", list(MENU_PAGES), key="menu_choice", on_change=select_page_by_label)
 
     st.sidebar.markdown("---")
 
@@ -890,8 +868,7 @@ def main_app():
     st.sidebar.write(f"Usuário: {st.session_state.username}")
 
     # Botão de logout
-    if st.sidebar.button("🚪 Sair", use_container_width=True):
-        logout()
+    st.sidebar.button("🚪 Sair", use_container_width=True, on_click=logout)
 
     # Renderiza a página atual
     if st.session_state.page == "home":
@@ -902,16 +879,17 @@ def main_app():
         render_new_recommendation_page()
     elif st.session_state.page == "my_recommendations":
         render_my_recommendations_page()
+    elif st.session_state.page == "analytics":
+        render_analytics_page()
 
 # ========== NOVO: BOTÃO DE ATUALIZAR ==========
     st.sidebar.markdown("---")
 
-    # Botão principal de atualização
-    if st.sidebar.button("🔄 Atualizar Página",
-                        use_container_width=True,
-                        type="secondary",  # Ou "primary" para destacar mais
-                        help="Recarrega a página mantendo seu login"):
-        rerun()
+    # Botão principal de atualização (o próprio clique já reexecuta o script)
+    st.sidebar.button("🔄 Atualizar Página",
+                      use_container_width=True,
+                      type="secondary",  # Ou "primary" para destacar mais
+                      help="Recarrega a página mantendo seu login")
 
     # Informação útil
     st.sidebar.caption("Pressione F5 no navegador para atualizar")
@@ -0,0 +1,183 @@
+"""Senhas com hash (scrypt) e verificação fora da thread do script.
+
+Formato gravado em users.password:
+
+    scrypt$<n>$<r>$<p>$<salt base64>$<hash base64>
+
+O custo vem de INDICA_SCRYPT_N / INDICA_SCRYPT_R / INDICA_SCRYPT_P. Senhas antigas em texto
+puro continuam aceitas e são regravadas com hash no próximo login (ver needs_rehash).
+O cálculo do scrypt roda num pool limitado de threads (o hashlib libera o GIL), então uma
+rajada de logins fica na fila em vez de disputar CPU com as sessões que já estão no app.
+
+Antes de qualquer consulta ou hash, login_allowed aplica um limite de tentativas em memória
+(token bucket por usuário e por sessão, com bloqueio após falhas seguidas).
+"""
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+SCRYPT_N = int(os.environ.get("INDICA_SCRYPT_N", 1 << 14))
+SCRYPT_R = int(os.environ.get("INDICA_SCRYPT_R", 8))
+SCRYPT_P = int(os.environ.get("INDICA_SCRYPT_P", 1))
+SALT_BYTES = 16
+HASH_BYTES = 32
+
+# Pool de verificação: AUTH_WORKERS cálculos em paralelo, no máximo AUTH_MAX_PENDING na fila.
+# Com a fila cheia o login é recusado na hora (AuthBusy), sem prender a thread do script
+AUTH_WORKERS = int(os.environ.get("INDICA_AUTH_WORKERS", min(4, os.cpu_count() or 1)))
+AUTH_MAX_PENDING = int(os.environ.get("INDICA_AUTH_MAX_PENDING", 64))
+AUTH_TIMEOUT = float(os.environ.get("INDICA_AUTH_TIMEOUT", 10))
+
+PREFIX = "scrypt"
+
+_executor = ThreadPoolExecutor(max_workers=AUTH_WORKERS, thread_name_prefix="auth")
+_pending = threading.BoundedSemaphore(AUTH_MAX_PENDING)
+
+class AuthBusy(Exception):
+    """Fila de verificação cheia ou resposta demorou mais que AUTH_TIMEOUT"""
+
+def _scrypt(password, salt, n, r, p):
+    # maxmem precisa cobrir 128 * n * r bytes (o padrão do OpenSSL é 32 MB)
+    return hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * n * r + (1 << 20), dklen=HASH_BYTES)
+
+def _b64(data):
+    return base64.b64encode(data).decode("ascii")
+
+def hash_password(password):
+    """Gera o hash de uma senha com salt aleatório e o custo atual"""
+    salt = os.urandom(SALT_BYTES)
+    digest = _scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return f"{PREFIX}${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64(salt)}${_b64(digest)}"
+
+def is_hashed(stored):
+    return isinstance(stored, str) and stored.startswith(f"{PREFIX}$")
+
+def needs_rehash(stored):
+    """True para senhas em texto puro ou com custo diferente do atual"""
+    if not is_hashed(stored):
+        return True
+    try:
+        _, n, r, p, _, _ = stored.split("$")
+        return (int(n), int(r), int(p)) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    except ValueError:
+        return True
+
+def verify_password(password, stored):
+    """Confere a senha com o valor gravado (hash ou texto puro antigo), em tempo constante"""
+    if not stored:
+        return False
+    if not is_hashed(stored):
+        return hmac.compare_digest(password.encode("utf-8"), stored.encode("utf-8"))
+    try:
+        _, n, r, p, salt, digest = stored.split("$")
+        expected = base64.b64decode(digest)
+        actual = _scrypt(password, base64.b64decode(salt), int(n), int(r), int(p))
+    except (ValueError, TypeError):
+        return False
+    return hmac.compare_digest(actual, expected)
+
+def _run(func, *args):
+    """Roda func no pool de autenticação e espera o resultado (AuthBusy imediato se a fila estiver cheia)"""
+    if not _pending.acquire(blocking=False):
+        raise AuthBusy("Muitas tentativas de login ao mesmo tempo")
+    try:
+        future = _executor.submit(func, *args)
+    except Exception:
+        _pending.release()
+        raise
+    future.add_done_callback(lambda _: _pending.release())
+    try:
+        return future.result(timeout=AUTH_TIMEOUT)
+    except FutureTimeout:
+        raise AuthBusy("Verificação de senha demorou demais") from None
+
+def check_password(password, stored):
+    """verify_password executado no pool limitado"""
+    return _run(verify_password, password, stored)
+
+def make_password(password):
+    """hash_password executado no pool limitado"""
+    return _run(hash_password, password)
+
+# ==================== LIMITE DE TENTATIVAS ====================
+
+# Cada chave (usuário ou sessão) tem um balde de LOGIN_BURST tentativas que se recarrega a
+# LOGIN_RATE_PER_MINUTE por minuto. LOGIN_MAX_FAILURES falhas seguidas bloqueiam a chave por
+# LOGIN_LOCKOUT_SECONDS. Tudo fica em memória no processo; chaves paradas há mais de
+# LOGIN_LIMIT_TTL segundos são descartadas.
+LOGIN_RATE_PER_MINUTE = float(os.environ.get("INDICA_LOGIN_RATE_PER_MINUTE", 10))
+LOGIN_BURST = int(os.environ.get("INDICA_LOGIN_BURST", 5))
+LOGIN_MAX_FAILURES = int(os.environ.get("INDICA_LOGIN_MAX_FAILURES", 5))
+LOGIN_LOCKOUT_SECONDS = float(os.environ.get("INDICA_LOGIN_LOCKOUT_SECONDS", 300))
+LOGIN_LIMIT_TTL = float(os.environ.get("INDICA_LOGIN_LIMIT_TTL", 900))
+LOGIN_LIMIT_MAX_KEYS = int(os.environ.get("INDICA_LOGIN_LIMIT_MAX_KEYS", 100000))
+
+_limits_lock = threading.Lock()
+# chave -> [fichas, última recarga, falhas seguidas, bloqueado até]; ordem = último acesso
+_limits = OrderedDict()
+
+def login_keys(username, session_id):
+    """Chaves do limitador para uma tentativa de login"""
+    return (("user", (username or "").strip().lower()), ("session", session_id))
+
+def _bucket(key, now):
+    entry = _limits.get(key)
+    if entry is None:
+        entry = _limits[key] = [float(LOGIN_BURST), now, 0, 0.0]
+    else:
+        _limits.move_to_end(key)
+        entry[0] = min(LOGIN_BURST, entry[0] + (now - entry[1]) * LOGIN_RATE_PER_MINUTE / 60)
+        entry[1] = now
+    return entry
+
+def _evict(now):
+    # As chaves estão em ordem de acesso: as mais antigas ficam no começo
+    while _limits:
+        entry = next(iter(_limits.values()))
+        expired = now - entry[1] >= LOGIN_LIMIT_TTL and entry[3] <= now
+        if not expired and len(_limits) <= LOGIN_LIMIT_MAX_KEYS:
+            break
+        _limits.popitem(last=False)
+
+def login_allowed(*keys):
+    """Consome uma tentativa de cada chave; retorna (permitido, segundos até poder tentar de novo)"""
+    now = time.monotonic()
+    with _limits_lock:
+        _evict(now)
+        entries = [_bucket(key, now) for key in keys]
+        wait = 0.0
+        for tokens, _, _, locked_until in entries:
+            if locked_until > now:
+                wait = max(wait, locked_until - now)
+            elif tokens < 1:
+                wait = max(wait, (1 - tokens) * 60 / LOGIN_RATE_PER_MINUTE)
+        if wait:
+            return False, wait
+        for entry in entries:
+            entry[0] -= 1
+        return True, 0.0
+
+def record_login_failure(*keys):
+    """Conta uma falha; ao chegar em LOGIN_MAX_FAILURES a chave fica bloqueada"""
+    now = time.monotonic()
+    with _limits_lock:
+        for key in keys:
+            entry = _bucket(key, now)
+            entry[2] += 1
+            if entry[2] >= LOGIN_MAX_FAILURES:
+                entry[2] = 0
+                entry[3] = now + LOGIN_LOCKOUT_SECONDS
+
+def record_login_success(*keys):
+    """Zera as falhas seguidas após um login correto"""
+    with _limits_lock:
+        for key in keys:
+            entry = _limits.get(key)
+            if entry is not None:
+                entry[2] = 0
@@ -0,0 +1,64 @@
+"""Benchmark de logins por segundo com o custo de scrypt configurado.
+
+Uso:
+    python bench_login.py
+    INDICA_SCRYPT_N=32768 python bench_login.py --logins 400 --concurrency 32
+
+Cria um banco temporário com usuários de teste e dispara logins concorrentes pelo mesmo
+caminho do app (get_user + check_password no pool de autenticação).
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import auth
+import utils
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede logins/s com o custo de hash atual")
+    parser.add_argument("--users", type=int, default=50, help="usuários de teste")
+    parser.add_argument("--logins", type=int, default=200, help="logins no total")
+    parser.add_argument("--concurrency", type=int, default=16, help="sessões fazendo login ao mesmo tempo")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        utils.DB_FILE = os.path.join(tmp, "bench.db")
+        utils.init_database()
+
+        started = time.perf_counter()
+        for i in range(args.users):
+            utils.insert_row("users", {
+                "username": f"user{i}",
+                "password": auth.make_password(f"senha{i}"),
+                "created_at": datetime.now().isoformat()
+            })
+        hash_time = (time.perf_counter() - started) / args.users
+
+        def login(i):
+            username, password = f"user{i % args.users}", f"senha{i % args.users}"
+            t0 = time.perf_counter()
+            user = utils.get_user(username)
+            ok = auth.check_password(password, user["password"])
+            return ok, time.perf_counter() - t0
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as sessions:
+            results = list(sessions.map(login, range(args.logins)))
+        elapsed = time.perf_counter() - started
+        utils.close_connections()
+
+    latencies = sorted(latency for _, latency in results)
+    assert all(ok for ok, _ in results)
+    print(f"scrypt n={auth.SCRYPT_N} r={auth.SCRYPT_R} p={auth.SCRYPT_P}, "
+          f"{auth.AUTH_WORKERS} workers, {os.cpu_count()} CPUs")
+    print(f"hash isolado: {hash_time * 1000:.1f} ms")
+    print(f"{args.logins} logins com {args.concurrency} sessões: {args.logins / elapsed:.1f} logins/s")
+    print(f"latência p50 {statistics.median(latencies) * 1000:.0f} ms, "
+          f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.0f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Backup e exportação do banco SQLite sem parar o app.
+
+Uso:
+    python exporter.py backup backups/indica_app.db
+    python exporter.py export recommendations recs.jsonl
+    python exporter.py export groups groups.csv
+
+O backup usa a API de backup online do SQLite, copiando algumas páginas por vez para não
+bloquear quem escreve. As exportações percorrem o cursor linha a linha (memória limitada)
+dentro de uma única transação de leitura, então refletem um instante consistente do banco.
+Os arquivos gerados podem ser importados de volta com importer.py.
+"""
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import time
+
+from utils import DB_FILE, init_database, connection
+
+BACKUP_PAGES_PER_STEP = 1024
+BACKUP_STEP_SLEEP = 0.05
+EXPORT_FETCH_SIZE = 5000
+
+# Consultas no formato aceito por importer.py (listas JSON de votos e membros incluídas)
+EXPORT_QUERIES = {
+    "users": (
+        "SELECT username, password, created_at, preferred_group, last_group FROM users ORDER BY username"
+    ),
+    "groups": (
+        "SELECT g.id, g.name, g.description, g.categories, g.created_by, g.created_at, "
+        "(SELECT json_group_array(m.username) FROM group_members m WHERE m.group_id = g.id) AS members, "
+        "g.is_public "
+        "FROM groups g ORDER BY g.id"
+    ),
+    "recommendations": (
+        "SELECT r.id, r.title, r.description, r.category, r.rating, r.tags, r.author, r.group_id, "
+        "r.created_at, r.likes, r.dislikes, "
+        "(SELECT json_group_array(v.username) FROM votes v WHERE v.rec_id = r.id AND v.value = 1) AS liked_by, "
+        "(SELECT json_group_array(v.username) FROM votes v WHERE v.rec_id = r.id AND v.value = -1) AS disliked_by "
+        "FROM recommendations r ORDER BY r.id"
+    )
+}
+
+JSON_COLUMNS = {"categories", "members", "tags", "liked_by", "disliked_by"}
+
+# ==================== BACKUP ====================
+
+def backup_database(dest_path, pages=BACKUP_PAGES_PER_STEP, sleep=BACKUP_STEP_SLEEP, quiet=False):
+    """Cópia consistente do banco enquanto o app continua rodando"""
+    if os.path.abspath(dest_path) == os.path.abspath(DB_FILE):
+        raise ValueError("O destino do backup não pode ser o próprio banco")
+    os.makedirs(os.path.dirname(os.path.abspath(dest_path)), exist_ok=True)
+
+    def progress(status, remaining, total):
+        if not quiet:
+            print(f"   {total - remaining}/{total} páginas copiadas")
+
+    started = time.monotonic()
+    target = sqlite3.connect(dest_path)
+    try:
+        with connection() as conn:
+            # Entre um passo e outro o lock é liberado e escritores podem prosseguir
+            conn.backup(target, pages=pages, progress=progress, sleep=sleep)
+    finally:
+        target.close()
+
+    if not quiet:
+        print(f"✅ Backup salvo em {dest_path} ({time.monotonic() - started:.1f}s)")
+
+# ==================== EXPORTAÇÃO ====================
+
+def _iter_rows(conn, table_name):
+    """Percorre a tabela em blocos de EXPORT_FETCH_SIZE linhas"""
+    cursor = conn.execute(EXPORT_QUERIES[table_name])
+    columns = [description[0] for description in cursor.description]
+    while True:
+        rows = cursor.fetchmany(EXPORT_FETCH_SIZE)
+        if not rows:
+            return
+        for row in rows:
+            yield dict(zip(columns, row))
+
+def _to_record(item):
+    """Converte colunas JSON em listas para a exportação JSONL"""
+    for column in JSON_COLUMNS & item.keys():
+        item[column] = json.loads(item[column]) if item[column] else []
+    if "is_public" in item:
+        item["is_public"] = bool(item["is_public"])
+    return item
+
+def export_table(table_name, path, file_format=None, quiet=False):
+    """Exporta uma tabela para .jsonl ou .csv; retorna o número de linhas escritas"""
+    if table_name not in EXPORT_QUERIES:
+        raise ValueError(f"Tabela desconhecida: {table_name}")
+    file_format = file_format or ("csv" if path.endswith(".csv") else "jsonl")
+
+    started = time.monotonic()
+    count = 0
+    # Arquivo temporário + rename: um export interrompido não deixa arquivo pela metade
+    tmp_path = f"{path}.tmp"
+    with connection() as conn, open(tmp_path, "w", encoding="utf-8", newline="") as f:
+        # Uma transação de leitura: o export inteiro vê o mesmo instante do banco (WAL)
+        conn.execute("BEGIN")
+        try:
+            writer = None
+            for item in _iter_rows(conn, table_name):
+                if file_format == "csv":
+                    # Colunas JSON ficam como texto JSON dentro da célula
+                    if writer is None:
+                        writer = csv.DictWriter(f, fieldnames=list(item))
+                        writer.writeheader()
+                    writer.writerow(item)
+                else:
+                    f.write(json.dumps(_to_record(item), ensure_ascii=False) + "\n")
+                count += 1
+                if not quiet and count % 100000 == 0:
+                    print(f"   {count} linhas exportadas")
+        finally:
+            conn.rollback()
+    os.replace(tmp_path, path)
+
+    if not quiet:
+        elapsed = time.monotonic() - started
+        print(f"✅ {count} linhas de {table_name} exportadas para {path} ({elapsed:.1f}s)")
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description="Backup e exportação do Indica App")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    backup = commands.add_parser("backup", help="cópia online e consistente do banco")
+    backup.add_argument("dest", help="arquivo de destino do backup")
+    backup.add_argument("--pages", type=int, default=BACKUP_PAGES_PER_STEP,
+                        help="páginas copiadas por passo")
+    backup.add_argument("--sleep", type=float, default=BACKUP_STEP_SLEEP,
+                        help="pausa entre passos, em segundos")
+
+    export = commands.add_parser("export", help="exporta uma tabela para JSONL ou CSV")
+    export.add_argument("table", choices=sorted(EXPORT_QUERIES), help="tabela a exportar")
+    export.add_argument("path", help="arquivo de saída (.jsonl ou .csv)")
+    export.add_argument("--format", choices=["jsonl", "csv"], help="força o formato de saída")
+
+    args = parser.parse_args()
+    init_database()
+
+    if args.command == "backup":
+        backup_database(args.dest, args.pages, args.sleep)
+    else:
+        export_table(args.table, args.path, args.format)
+
+if __name__ == "__main__":
+    main()
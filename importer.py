@@ -0,0 +1,334 @@
+"""Importação em lote de exportações JSON/JSONL/CSV para o banco SQLite.
+
+Uso:
+    python importer.py recommendations dump.jsonl
+    python importer.py users data/users.json --batch-size 20000
+    python importer.py groups groups.csv
+
+Os arquivos são lidos de forma incremental (memória limitada) e gravados com executemany
+em transações por lote. O progresso fica em import_checkpoints: se a importação for
+interrompida, rodar o mesmo comando continua de onde parou. Linhas que já existem
+(mesma chave primária) são ignoradas, então repetir uma importação não duplica dados.
+"""
+import argparse
+import csv
+import json
+import os
+import time
+from datetime import datetime
+
+from utils import init_database, connection, bump_version, refresh_hot_scores, to_json
+
+IMPORT_BATCH_SIZE = 10000
+READ_CHUNK_SIZE = 1 << 16
+# Maior elemento JSON aceito; acima disso o arquivo é considerado malformado
+MAX_ELEMENT_SIZE = 1 << 26
+EMPTY_LIST = json.dumps([])
+
+# ==================== LEITURA INCREMENTAL ====================
+
+def _iter_jsonl(f):
+    """Um registro por linha; linhas vazias são ignoradas"""
+    for line in f:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+def _iter_json(f):
+    """Percorre um array (ou objeto) JSON de nível superior sem carregar o arquivo inteiro.
+
+    Arrays produzem cada elemento; objetos produzem pares (chave, valor).
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    eof = False
+
+    def fill():
+        nonlocal buffer, pos, eof
+        chunk = f.read(READ_CHUNK_SIZE)
+        if not chunk:
+            eof = True
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+    def skip(chars):
+        # Avança sobre espaços e separadores, lendo mais do arquivo quando necessário
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in chars:
+                pos += 1
+            if pos < len(buffer) or eof:
+                return
+            fill()
+
+    def decode():
+        nonlocal pos
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+                # Um número cortado pelo fim do bloco ("1.5e3" lido como "1.") também decodifica:
+                # o valor só vale se depois dele vier um separador
+                if eof or (end < len(buffer) and buffer[end] in " \t\r\n,:]}"):
+                    pos = end
+                    return value
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            if len(buffer) - pos > MAX_ELEMENT_SIZE:
+                raise ValueError(f"Elemento JSON com mais de {MAX_ELEMENT_SIZE} caracteres (arquivo malformado?)")
+            fill()
+
+    skip(" \t\r\n")
+    if pos >= len(buffer):
+        return
+    opening = buffer[pos]
+    if opening not in "[{":
+        raise ValueError("Esperado um array ou objeto JSON no início do arquivo")
+    closing = "]" if opening == "[" else "}"
+    pos += 1
+
+    while True:
+        skip(" \t\r\n,")
+        if pos >= len(buffer):
+            raise ValueError("Arquivo JSON terminou antes do fechamento")
+        if buffer[pos] == closing:
+            return
+        if opening == "[":
+            yield decode()
+        else:
+            key = decode()
+            skip(" \t\r\n")
+            if buffer[pos] != ":":
+                raise ValueError(f"Esperado ':' após a chave {key!r}")
+            pos += 1
+            skip(" \t\r\n")
+            yield key, decode()
+
+# Colunas do CSV gerado por exporter.py que precisam de conversão
+CSV_JSON_COLUMNS = {"categories", "members", "tags", "liked_by", "disliked_by"}
+CSV_INT_COLUMNS = {"id", "rating", "group_id", "likes", "dislikes", "preferred_group", "last_group"}
+
+def _iter_csv(f):
+    """Linhas de um CSV com cabeçalho; listas vêm como texto JSON dentro da célula"""
+    for row in csv.DictReader(f):
+        record = {}
+        for column, value in row.items():
+            if column in CSV_JSON_COLUMNS:
+                record[column] = json.loads(value) if value else []
+            elif column in CSV_INT_COLUMNS:
+                record[column] = int(value) if value else None
+            elif column == "is_public":
+                record[column] = value not in ("", "0", "False", "false")
+            else:
+                record[column] = value
+        yield record
+
+def _detect_format(path):
+    if path.endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    if path.endswith(".csv"):
+        return "csv"
+    return "json"
+
+def iter_records(path, file_format=None):
+    """Registros de um arquivo .json, .jsonl ou .csv, lidos de forma incremental"""
+    file_format = file_format or _detect_format(path)
+    readers = {"json": _iter_json, "jsonl": _iter_jsonl, "csv": _iter_csv}
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        reader = readers[file_format]
+        for record in reader(f):
+            # users.json antigo: {"nome": {...}} ou {"nome": "senha"}
+            if isinstance(record, tuple):
+                username, data = record
+                data = {"password": data} if isinstance(data, str) else dict(data)
+                data.setdefault("username", username)
+                record = data
+            yield record
+
+# ==================== CONVERSÃO PARA LINHAS ====================
+
+def _user_rows(record, now):
+    return [(
+        record["username"],
+        record.get("password", ""),
+        record.get("created_at") or now,
+        record.get("preferred_group"),
+        record.get("last_group")
+    )], []
+
+def _group_rows(record, now):
+    created_at = record.get("created_at") or now
+    row = (
+        record.get("id"),
+        record.get("name", ""),
+        record.get("description", ""),
+        to_json(record.get("categories", [])),
+        record.get("created_by", ""),
+        created_at,
+        EMPTY_LIST,
+        1 if record.get("is_public", True) else 0
+    )
+    members = [(member, created_at) for member in record.get("members", [])]
+    return [row], members
+
+def _recommendation_rows(record, now):
+    liked_by = record.get("liked_by") or []
+    disliked_by = record.get("disliked_by") or []
+    # Os triggers de votes somam os votos importados; aqui fica só o excedente sem autor
+    row = (
+        record.get("id"),
+        record.get("title", ""),
+        record.get("description", ""),
+        record.get("category", ""),
+        record.get("rating", 0),
+        to_json(record.get("tags", [])),
+        record.get("author", ""),
+        record.get("group_id", 0),
+        record.get("created_at") or now,
+        max(int(record.get("likes", 0) or 0) - len(liked_by), 0),
+        max(int(record.get("dislikes", 0) or 0) - len(disliked_by), 0),
+        EMPTY_LIST,
+        EMPTY_LIST
+    )
+    votes = [(username, 1, now) for username in liked_by]
+    votes += [(username, -1, now) for username in disliked_by]
+    return [row], votes
+
+# Para cada tabela: conversor, INSERT principal e INSERT das linhas filhas (membros/votos)
+IMPORT_SPECS = {
+    "users": (
+        _user_rows,
+        "INSERT OR IGNORE INTO users (username, password, created_at, preferred_group, last_group) "
+        "VALUES (?, ?, ?, ?, ?)",
+        None
+    ),
+    "groups": (
+        _group_rows,
+        "INSERT OR IGNORE INTO groups "
+        "(id, name, description, categories, created_by, created_at, members, is_public) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        "INSERT OR IGNORE INTO group_members (group_id, username, joined_at) VALUES (?, ?, ?)"
+    ),
+    "recommendations": (
+        _recommendation_rows,
+        "INSERT OR IGNORE INTO recommendations "
+        "(id, title, description, category, rating, tags, author, group_id, created_at, "
+        "likes, dislikes, liked_by, disliked_by) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        "INSERT OR IGNORE INTO votes (rec_id, username, value, created_at) VALUES (?, ?, ?, ?)"
+    )
+}
+
+# ==================== IMPORTAÇÃO ====================
+
+def _write_batch(conn, table_name, batch, source, records_done):
+    """Grava um lote e o checkpoint na mesma transação"""
+    convert, insert_sql, child_sql = IMPORT_SPECS[table_name]
+    now = datetime.now().isoformat()
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        rows, children = [], []
+        for record in batch:
+            record_rows, record_children = convert(record, now)
+            if not (child_sql and record_children):
+                rows.extend(record_rows)
+                continue
+            # Com filhas, a linha é inserida sozinha: as filhas só entram se ela foi de fato
+            # inserida (OR IGNORE pula ids e nomes de grupo que já existem) e usam o id gravado
+            cursor = conn.execute(insert_sql, record_rows[0])
+            if cursor.rowcount:
+                children.extend((cursor.lastrowid,) + child for child in record_children)
+
+        conn.executemany(insert_sql, rows)
+        if child_sql and children:
+            conn.executemany(child_sql, children)
+
+        conn.execute(
+            "INSERT INTO import_checkpoints (source, table_name, records, completed, updated_at) "
+            "VALUES (?, ?, ?, 0, ?) "
+            "ON CONFLICT(source) DO UPDATE SET records = excluded.records, updated_at = excluded.updated_at",
+            (source, table_name, records_done, now)
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+def import_file(path, table_name, file_format=None, batch_size=IMPORT_BATCH_SIZE,
+                restart=False, quiet=False):
+    """Importa um arquivo JSON/JSONL/CSV para a tabela; retorna o número de registros processados"""
+    if table_name not in IMPORT_SPECS:
+        raise ValueError(f"Tabela desconhecida: {table_name}")
+
+    # O tamanho entra na chave para que um arquivo novo no mesmo caminho não herde o checkpoint
+    source = f"{os.path.abspath(path)}#{os.path.getsize(path)}"
+    with connection() as conn:
+        checkpoint = conn.execute(
+            "SELECT records, completed FROM import_checkpoints WHERE source = ?", (source,)
+        ).fetchone()
+        if restart or checkpoint is None:
+            skip, completed = 0, False
+        else:
+            skip, completed = checkpoint
+
+        if completed:
+            if not quiet:
+                print(f"✅ {path} já foi importado ({skip} registros); use --restart para repetir")
+            return skip
+
+        if skip and not quiet:
+            print(f"🔄 Retomando {path} a partir do registro {skip}")
+
+        started = time.monotonic()
+        done = 0
+        batch = []
+        for record in iter_records(path, file_format):
+            done += 1
+            if done <= skip:
+                continue
+            batch.append(record)
+            if len(batch) >= batch_size:
+                _write_batch(conn, table_name, batch, source, done)
+                batch = []
+                if not quiet:
+                    elapsed = time.monotonic() - started
+                    print(f"   {done} registros ({(done - skip) / max(elapsed, 1e-9):,.0f}/s)")
+
+        if batch:
+            _write_batch(conn, table_name, batch, source, done)
+
+        with conn:
+            conn.execute(
+                "UPDATE import_checkpoints SET completed = 1, updated_at = ? WHERE source = ?",
+                (datetime.now().isoformat(), source)
+            )
+
+    if table_name == "recommendations":
+        # Linhas importadas entram com hot_score 0; calcula o ranking de uma vez no fim
+        refresh_hot_scores()
+    bump_version(table_name, "group_members")
+
+    if not quiet:
+        elapsed = time.monotonic() - started
+        print(f"✅ {done - skip} registros importados em {elapsed:.1f}s "
+              f"({(done - skip) / max(elapsed, 1e-9):,.0f}/s)")
+    return done
+
+def main():
+    parser = argparse.ArgumentParser(description="Importa exportações JSON/JSONL/CSV para o Indica App")
+    parser.add_argument("table", choices=sorted(IMPORT_SPECS), help="tabela de destino")
+    parser.add_argument("path", help="arquivo .json (array/objeto), .jsonl (um registro por linha) ou .csv")
+    parser.add_argument("--format", choices=["json", "jsonl", "csv"], help="força o formato do arquivo")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE,
+                        help="registros por transação")
+    parser.add_argument("--restart", action="store_true",
+                        help="ignora o checkpoint e começa do início")
+    args = parser.parse_args()
+
+    init_database()
+    import_file(args.path, args.table, args.format, args.batch_size, args.restart)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""Feed "Para você": recomendações personalizadas por co-likes dentro de cada grupo.
+
+A matriz de votos de um grupo (usuários × recomendações, +1 like / -1 dislike) fica em
+memória no formato COO (três arrays NumPy). A pontuação de um usuário u é a similaridade
+item-item por cosseno aplicada aos votos dele:
+
+    score = D⁻¹ Rᵀ R D⁻¹ r_u        (D = norma de cada coluna de R)
+
+calculada como dois produtos matriz-vetor esparsos com np.bincount, sem montar a matriz
+de similaridade item × item. Cada modelo guarda a versão do grupo (group_stats.version)
+em que foi montado: só mudanças no próprio grupo o invalidam. Votos feitos pelo app
+alteram uma entrada da matriz (apply_vote) sem reconstrução, e o feed de cada usuário fica
+em cache até a próxima mudança no modelo.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from utils import CACHE_MAX_ENTRIES, connection, get_recommendation, group_version
+
+FOR_YOU_SIZE = 10
+MODEL_CACHE_ENTRIES = 32
+
+# _lock protege os dicionários abaixo; a montagem de um modelo usa a trava do grupo em
+# _build_locks e a leitura/alteração da matriz usa a trava do próprio modelo
+_lock = threading.Lock()
+_models = OrderedDict()
+_build_locks = {}
+_feeds = OrderedDict()
+
+class _GroupModel:
+    """Matriz de votos de um grupo, em COO, atualizável entrada a entrada"""
+
+    def __init__(self, group_id):
+        self.group_id = group_id
+        self.generation = 0
+        self.lock = threading.Lock()
+
+        with connection() as conn:
+            # Versão, recomendações e votos lidos no mesmo snapshot
+            conn.execute("BEGIN")
+            self.version = group_version(conn, group_id)
+            items = conn.execute(
+                "SELECT id, author FROM recommendations WHERE group_id = ? ORDER BY id", (group_id,)
+            ).fetchall()
+            votes = conn.execute(
+                "SELECT v.username, v.rec_id, v.value FROM votes v "
+                "JOIN recommendations r ON r.id = v.rec_id WHERE r.group_id = ?",
+                (group_id,)
+            ).fetchall()
+            conn.rollback()
+
+        self.item_ids = np.fromiter((rec_id for rec_id, _ in items), dtype=np.int64, count=len(items))
+        self.authors = [author for _, author in items]
+
+        self.user_codes = codes = {}
+        self.nnz = nnz = len(votes)
+        size = max(nnz, 16)
+        self.rows = np.zeros(size, dtype=np.int64)
+        self.cols = np.zeros(size, dtype=np.int64)
+        self.vals = np.zeros(size, dtype=np.float64)
+        self.rows[:nnz] = np.fromiter(
+            (codes.setdefault(username, len(codes)) for username, _, _ in votes), dtype=np.int64, count=nnz
+        )
+        # item_ids está ordenado: a coluna de cada voto sai de uma busca binária
+        rec_ids = np.fromiter((rec_id for _, rec_id, _ in votes), dtype=np.int64, count=nnz)
+        self.cols[:nnz] = np.searchsorted(self.item_ids, rec_ids)
+        self.vals[:nnz] = np.fromiter((value for _, _, value in votes), dtype=np.float64, count=nnz)
+
+    def set_vote(self, username, rec_id, value):
+        """Grava o voto atual (1, -1 ou 0 para sem voto) de um usuário em uma recomendação"""
+        col = int(np.searchsorted(self.item_ids, rec_id))
+        if col == len(self.item_ids) or self.item_ids[col] != rec_id:
+            return False
+        user = self.user_codes.setdefault(username, len(self.user_codes))
+        found = np.flatnonzero((self.rows[:self.nnz] == user) & (self.cols[:self.nnz] == col))
+        if len(found):
+            position = found[0]
+        else:
+            if not value:
+                return True
+            if self.nnz == len(self.vals):
+                self.rows = np.resize(self.rows, 2 * self.nnz)
+                self.cols = np.resize(self.cols, 2 * self.nnz)
+                self.vals = np.resize(self.vals, 2 * self.nnz)
+            position = self.nnz
+            self.nnz += 1
+            self.rows[position], self.cols[position] = user, col
+        # Votos removidos ficam como 0 e não contribuem para os produtos
+        self.vals[position] = value
+        self.generation += 1
+        return True
+
+    def scores(self, username):
+        """Pontuação de cada recomendação do grupo para o usuário"""
+        n_items = len(self.item_ids)
+        user = self.user_codes.get(username)
+        if user is None or not n_items:
+            return np.zeros(n_items), np.zeros(n_items, dtype=bool)
+
+        rows, cols, vals = self.rows[:self.nnz], self.cols[:self.nnz], self.vals[:self.nnz]
+        norms = np.sqrt(np.bincount(cols, weights=vals * vals, minlength=n_items))
+        norms[norms == 0] = 1.0
+
+        mine = rows == user
+        r_u = np.zeros(n_items)
+        r_u[cols[mine]] = vals[mine]
+        voted = r_u != 0
+
+        # R D⁻¹ r_u: afinidade de cada usuário com os votos de u (u fora da conta)
+        weights = np.bincount(rows, weights=vals * (r_u / norms)[cols], minlength=len(self.user_codes))
+        weights[user] = 0.0
+        # D⁻¹ Rᵀ (...): volta para o espaço de recomendações
+        scores = np.bincount(cols, weights=vals * weights[rows], minlength=n_items) / norms
+        return scores, voted
+
+def _cached_model(group_id, version):
+    """Modelo em cache se ainda estiver na versão do grupo (chamar com _lock)"""
+    model = _models.get(group_id)
+    if model is None or model.version != version:
+        return None
+    _models.move_to_end(group_id)
+    return model
+
+def _get_model(group_id):
+    with connection() as conn:
+        version = group_version(conn, group_id)
+    with _lock:
+        model = _cached_model(group_id, version)
+        if model is not None:
+            return model
+        build_lock = _build_locks.setdefault(group_id, threading.Lock())
+
+    # Montagem fora de _lock: sessões de outros grupos não esperam; as do mesmo grupo
+    # esperam a primeira montagem em vez de repeti-la
+    with build_lock:
+        with _lock:
+            model = _cached_model(group_id, version)
+            if model is not None:
+                return model
+        model = _GroupModel(group_id)
+        with _lock:
+            current = _models.get(group_id)
+            if current is None or current.version < model.version:
+                _models[group_id] = current = model
+            _models.move_to_end(group_id)
+            while len(_models) > MODEL_CACHE_ENTRIES:
+                evicted, _ = _models.popitem(last=False)
+                _build_locks.pop(evicted, None)
+            return current
+
+def _ranked_ids(model, username, limit):
+    key = (model.group_id, username, limit)
+    with model.lock:
+        generation = model.generation
+        with _lock:
+            entry = _feeds.get(key)
+            if entry is not None and entry[0] is model and entry[1] == generation:
+                _feeds.move_to_end(key)
+                return entry[2]
+        scores, voted = model.scores(username)
+
+    # Fora: o que o usuário já votou e o que ele mesmo indicou
+    candidates = np.flatnonzero((scores > 0) & ~voted)
+    candidates = [code for code in candidates if model.authors[code] != username]
+    top = sorted(candidates, key=lambda code: (-scores[code], -model.item_ids[code]))[:limit]
+    rec_ids = [int(model.item_ids[code]) for code in top]
+
+    with _lock:
+        _feeds[key] = (model, generation, rec_ids)
+        _feeds.move_to_end(key)
+        while len(_feeds) > CACHE_MAX_ENTRIES:
+            _feeds.popitem(last=False)
+    return rec_ids
+
+def get_for_you(group_id, username, limit=FOR_YOU_SIZE):
+    """Recomendações do grupo que o usuário ainda não votou, mais parecidas com o que ele curtiu"""
+    try:
+        rec_ids = _ranked_ids(_get_model(group_id), username, limit)
+    except Exception as e:
+        print(f"⚠️  get_for_you: {e}")
+        return []
+    recommendations = (get_recommendation(rec_id) for rec_id in rec_ids)
+    return [rec for rec in recommendations if rec]
+
+def apply_vote(rec_id, username):
+    """Atualiza o modelo do grupo com o voto atual do usuário (chamar após toggle_vote)"""
+    try:
+        with connection() as conn:
+            row = conn.execute(
+                "SELECT r.group_id, COALESCE(v.value, 0), COALESCE(s.version, 0) FROM recommendations r "
+                "LEFT JOIN votes v ON v.rec_id = r.id AND v.username = ? "
+                "LEFT JOIN group_stats s ON s.group_id = r.group_id WHERE r.id = ?",
+                (username, rec_id)
+            ).fetchone()
+    except Exception as e:
+        print(f"⚠️  apply_vote: {e}")
+        return
+    if row is None:
+        return
+
+    group_id, value, version = row
+    with _lock:
+        model = _models.get(group_id)
+    if model is None:
+        return
+    with model.lock:
+        # Um voto incrementa a versão do grupo uma vez (trigger stats_after_vote). Se o grupo
+        # mudou mais que isso, houve outras escritas e o modelo é remontado na próxima leitura
+        if model.version == version - 1 and model.set_vote(username, rec_id, value):
+            model.version = version
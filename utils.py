@@ -1,17 +1,399 @@
 import sqlite3
 import json
+import math
 import os
+import functools
+import inspect
+import queue
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from contextlib import contextmanager
 from datetime import datetime
 
 DB_FILE = "indica_app.db"
 
-def init_database():
-    """Inicializa o banco de dados SQLite"""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+# Ajustes de desempenho do SQLite (podem ser sobrescritos por variáveis de ambiente)
+DB_POOL_SIZE = int(os.environ.get("INDICA_DB_POOL_SIZE", 8))
+DB_BUSY_TIMEOUT_MS = int(os.environ.get("INDICA_DB_BUSY_TIMEOUT_MS", 5000))
+DB_CACHE_SIZE_KB = int(os.environ.get("INDICA_DB_CACHE_SIZE_KB", 16384))
+DB_MMAP_SIZE = int(os.environ.get("INDICA_DB_MMAP_SIZE", 128 * 1024 * 1024))
+CACHE_MAX_ENTRIES = int(os.environ.get("INDICA_CACHE_MAX_ENTRIES", 512))
+
+# Ranking "Em alta": pontuação com decaimento no tempo, recalculada periodicamente
+HOT_GRAVITY = float(os.environ.get("INDICA_HOT_GRAVITY", 1.5))
+HOT_REFRESH_SECONDS = int(os.environ.get("INDICA_HOT_REFRESH_SECONDS", 900))
+
+# ==================== CONEXÕES ====================
+
+# Conexões ociosas, reaproveitadas entre execuções do script do Streamlit e entre sessões
+_connection_pool = queue.LifoQueue(maxsize=DB_POOL_SIZE)
+
+def _open_connection():
+    """Abre uma conexão nova já com os PRAGMAs de desempenho aplicados"""
+    conn = sqlite3.connect(DB_FILE, timeout=DB_BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+    # WAL permite leituras concorrentes enquanto uma sessão escreve
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS:d}")
+    conn.execute(f"PRAGMA cache_size = -{DB_CACHE_SIZE_KB:d}")
+    conn.execute(f"PRAGMA mmap_size = {DB_MMAP_SIZE:d}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.create_function("hot_score", 4, compute_hot_score)
+    conn.create_function("fold", 1, fold_text, deterministic=True)
+    return conn
+
+def _acquire_connection():
+    """Pega uma conexão do pool (ou abre uma nova se todas estiverem em uso)"""
+    try:
+        return _connection_pool.get_nowait()
+    except queue.Empty:
+        return _open_connection()
+
+def _release_connection(conn):
+    """Devolve a conexão ao pool, descartando transações pendentes"""
+    try:
+        if conn.in_transaction:
+            conn.rollback()
+        _connection_pool.put_nowait(conn)
+    except (queue.Full, sqlite3.Error):
+        conn.close()
+
+@contextmanager
+def connection():
+    """Empresta uma conexão do pool dentro de um bloco with (usado pelos scripts de linha de comando)"""
+    conn = _acquire_connection()
+    try:
+        yield conn
+    finally:
+        _release_connection(conn)
+
+def close_connections():
+    """Fecha todas as conexões ociosas do pool e a do escritor (ex.: antes de trocar DB_FILE)"""
+    stop_writer()
+    while True:
+        try:
+            _connection_pool.get_nowait().close()
+        except queue.Empty:
+            break
+
+# ==================== ESCRITOR ÚNICO ====================
+
+# Todas as escritas do app passam por uma única thread, dona da conexão de escrita, então
+# sessões concorrentes não disputam o lock do SQLite. As escritas que chegam enquanto um lote
+# está gravando entram juntas no próximo (group commit: um COMMIT para várias escritas).
+# Cada escrita roda num SAVEPOINT próprio: se falhar, só ela é desfeita.
+WRITE_BATCH_MAX = int(os.environ.get("INDICA_WRITE_BATCH_MAX", 256))
+# A cada EXTERNAL_CHECK_SECONDS sem escritas (e antes de cada lote) o escritor confere
+# PRAGMA data_version da sua conexão, que só muda quando outra conexão confirma uma escrita
+# (importer.py, outro processo do app...). Se mudou, todo o cache de leitura expira.
+EXTERNAL_CHECK_SECONDS = float(os.environ.get("INDICA_EXTERNAL_CHECK_SECONDS", 1))
+# Tempo máximo que _write espera pelo COMMIT de uma escrita
+WRITE_TIMEOUT = float(os.environ.get("INDICA_WRITE_TIMEOUT", 30))
+
+_write_queue = queue.Queue()
+_writer_lock = threading.Lock()
+_writer_thread = None
+_writer_error = None
+_STOP_WRITER = object()
+
+def _write_batch(conn, batch):
+    """Grava um lote de escritas em uma transação e resolve os futures depois do COMMIT"""
+    done = []
+    tables = set()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        for future, func, args, job_tables in batch:
+            if not future.set_running_or_notify_cancel():
+                continue
+            conn.execute("SAVEPOINT write_job")
+            try:
+                result = func(conn, *args)
+            except Exception as e:
+                conn.execute("ROLLBACK TO write_job")
+                conn.execute("RELEASE write_job")
+                future.set_exception(e)
+                continue
+            conn.execute("RELEASE write_job")
+            done.append((future, result))
+            tables.update(job_tables)
+        conn.commit()
+    except Exception as e:
+        # BEGIN ou COMMIT falhou: nada do lote foi gravado
+        if conn.in_transaction:
+            conn.rollback()
+        for future, *_ in batch:
+            if not future.done():
+                future.set_exception(e)
+        return
+
+    # Caches invalidados antes de liberar quem espera, para que a próxima leitura já veja a escrita
+    bump_version(*tables)
+    for future, result in done:
+        future.set_result(result)
+
+def _check_external_writes(conn, data_version):
+    """Expira o cache se outra conexão gravou no banco desde a última conferência"""
+    current = conn.execute("PRAGMA data_version").fetchone()[0]
+    if data_version is not None and current != data_version:
+        bump_all_versions()
+    return current
+
+def _fail_write(future, error):
+    """Resolve com erro uma escrita que não foi gravada (ignora as canceladas)"""
+    try:
+        if future.set_running_or_notify_cancel():
+            future.set_exception(error)
+    except RuntimeError:
+        # Já estava rodando quando o escritor falhou
+        if not future.done():
+            future.set_exception(error)
+
+def _writer_loop(jobs):
+    global _writer_thread, _writer_error
+    conn = None
+    batch = []
+    try:
+        conn = _open_connection()
+        data_version = _check_external_writes(conn, None)
+        while True:
+            try:
+                batch = [jobs.get(timeout=EXTERNAL_CHECK_SECONDS)]
+            except queue.Empty:
+                data_version = _check_external_writes(conn, data_version)
+                continue
+            while len(batch) < WRITE_BATCH_MAX:
+                try:
+                    batch.append(jobs.get_nowait())
+                except queue.Empty:
+                    break
+            stop = any(job is _STOP_WRITER for job in batch)
+            batch = [job for job in batch if job is not _STOP_WRITER]
+            if batch:
+                data_version = _check_external_writes(conn, data_version)
+                _write_batch(conn, batch)
+            if stop:
+                return
+    except Exception as e:
+        # Sem conexão não há como gravar: quem espera recebe o erro em vez de ficar preso.
+        # A próxima escrita inicia outra thread, que tenta abrir o banco de novo
+        print(f"❌ Thread de escrita encerrada: {e}")
+        with _writer_lock:
+            for future, *_ in (job for job in batch if job is not _STOP_WRITER):
+                _fail_write(future, e)
+            while True:
+                try:
+                    job = jobs.get_nowait()
+                except queue.Empty:
+                    break
+                if job is not _STOP_WRITER:
+                    _fail_write(job[0], e)
+            if _writer_thread is threading.current_thread():
+                _writer_thread, _writer_error = None, e
+    finally:
+        if conn is not None:
+            conn.close()
+
+def submit_write(func, *args, tables=()):
+    """Agenda func(conn, *args) na thread de escrita e retorna um Future com o resultado.
+
+    O Future só é resolvido depois do COMMIT do lote; tables são as tabelas cujo cache
+    deve ser invalidado. func não deve abrir nem confirmar transações.
+    """
+    if threading.current_thread() is _writer_thread:
+        raise RuntimeError("submit_write chamado de dentro de uma escrita")
+    future = Future()
+    with _writer_lock:
+        _start_writer()
+        _write_queue.put((future, func, args, tables))
+    return future
+
+def _start_writer():
+    """Inicia a thread de escrita se ela não estiver rodando (chamar com _writer_lock)"""
+    global _writer_thread, _writer_error
+    if _writer_thread is None or not _writer_thread.is_alive():
+        _writer_error = None
+        _writer_thread = threading.Thread(
+            target=_writer_loop, args=(_write_queue,), name="db-writer", daemon=True
+        )
+        _writer_thread.start()
+
+def ensure_writer():
+    """Garante a thread de escrita, que também detecta escritas de outros processos.
+
+    Depois de uma falha ao abrir o banco, só a próxima escrita tenta de novo.
+    """
+    if _writer_thread is None and _writer_error is None:
+        with _writer_lock:
+            _start_writer()
+
+def _write(func, *args, tables=()):
+    """submit_write esperando o resultado por até WRITE_TIMEOUT segundos (exceções da escrita são relançadas)"""
+    future = submit_write(func, *args, tables=tables)
+    try:
+        return future.result(timeout=WRITE_TIMEOUT)
+    except FutureTimeout:
+        # Se ainda estiver na fila, a escrita é descartada
+        future.cancel()
+        raise TimeoutError(f"Escrita não confirmada em {WRITE_TIMEOUT:g} s") from None
+
+def stop_writer():
+    """Grava o que estiver na fila e encerra a thread de escrita"""
+    global _writer_thread
+    with _writer_lock:
+        thread, _writer_thread = _writer_thread, None
+        if thread is not None and thread.is_alive():
+            _write_queue.put(_STOP_WRITER)
+    if thread is not None:
+        thread.join()
+
+# ==================== TABELAS ====================
+
+# Nomes aceitos pela API; os nomes de arquivo do armazenamento antigo (JSON) continuam válidos
+TABLE_NAMES = {
+    "users": "users",
+    "groups": "groups",
+    "recommendations": "recommendations",
+    "users.json": "users",
+    "groups.json": "groups",
+    "recommendations.json": "recommendations"
+}
+
+def resolve_table(name):
+    """Converte o nome recebido no nome real da tabela; nomes desconhecidos geram ValueError"""
+    try:
+        return TABLE_NAMES[name]
+    except KeyError:
+        raise ValueError(f"Tabela desconhecida: {name}") from None
+
+# ==================== RANKING "EM ALTA" ====================
+
+def wilson_lower_bound(likes, dislikes, z=1.96):
+    """Limite inferior do intervalo de Wilson para a proporção de likes (confiança de 95%)"""
+    total = likes + dislikes
+    if total <= 0:
+        return 0.0
+    p = likes / total
+    return (p + z * z / (2 * total) - z * math.sqrt((p * (1 - p) + z * z / (4 * total)) / total)) / (1 + z * z / total)
+
+def compute_hot_score(likes, dislikes, created_at, now=None):
+    """Pontuação "Em alta": likes ajustados pela confiança de Wilson, com decaimento no tempo.
+
+    Parecido com o ranking do Hacker News: (votos + 1) / (idade_em_horas + 2) ^ HOT_GRAVITY,
+    usando likes_totais × limite_de_Wilson no lugar dos votos brutos.
+    """
+    likes = likes or 0
+    dislikes = dislikes or 0
+    now = now if isinstance(now, datetime) else (datetime.fromisoformat(now) if now else datetime.now())
+    try:
+        age_hours = max((now - datetime.fromisoformat(created_at)).total_seconds() / 3600, 0)
+    except (TypeError, ValueError):
+        age_hours = 0
+    points = wilson_lower_bound(likes, dislikes) * (likes + dislikes) + 1
+    return points / (age_hours + 2) ** HOT_GRAVITY
+
+# Todas as pontuações usam o mesmo instante de referência, gravado em hot_score_reference e
+# renovado só por refresh_hot_scores: votos e inserções entre uma atualização e outra ficam
+# comparáveis com as linhas que ninguém tocou (um like desfeito devolve a pontuação anterior)
+HOT_SCORE_UPDATE = (
+    "UPDATE recommendations "
+    "SET hot_score = hot_score(likes, dislikes, created_at, (SELECT reference FROM hot_score_reference))"
+)
+
+# ==================== CACHE DE LEITURA ====================
+
+# Cache compartilhado por todas as sessões do processo. Cada entrada guarda as versões
+# das tabelas lidas; qualquer escrita nessas tabelas incrementa a versão e a entrada expira.
+# Escritas feitas fora deste processo expiram o cache inteiro (ver _check_external_writes).
+_cache_lock = threading.Lock()
+_cache = OrderedDict()
+_table_versions = {"users": 0, "groups": 0, "group_members": 0, "recommendations": 0}
+
+def bump_version(*tables):
+    """Marca as tabelas como alteradas, invalidando as leituras em cache que dependem delas"""
+    with _cache_lock:
+        for table in tables:
+            _table_versions[table] = _table_versions.get(table, 0) + 1
+
+def bump_all_versions():
+    """Expira todo o cache de leitura (o banco foi alterado por outra conexão)"""
+    with _cache_lock:
+        for table in _table_versions:
+            _table_versions[table] += 1
+
+def table_version(table):
+    """Versão atual de uma tabela (muda a cada escrita, inclusive as de outros processos)"""
+    with _cache_lock:
+        return _table_versions.get(table, 0)
+
+def _cache_get_or_load(tables, key, loader):
+    """Retorna o valor em cache se as versões das tabelas não mudaram; senão recarrega"""
+    # Sem a thread de escrita, escritas de outros processos não seriam percebidas
+    ensure_writer()
+    with _cache_lock:
+        versions = tuple(_table_versions.get(t, 0) for t in tables)
+        entry = _cache.get(key)
+        if entry is not None and entry[0] == versions:
+            _cache.move_to_end(key)
+            return entry[1]
+
+    # Consulta fora do lock; as versões foram lidas antes, então uma escrita
+    # concorrente faz esta entrada expirar na próxima leitura
+    value = loader()
+
+    with _cache_lock:
+        _cache[key] = (versions, value)
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_MAX_ENTRIES:
+            _cache.popitem(last=False)
+    return value
+
+def cached_read(*tables, fallback=list):
+    """Decorador para leituras: o resultado fica em memória até a próxima escrita em tables.
+
+    Os valores retornados são compartilhados entre sessões e não devem ser modificados.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (func.__name__, args, tuple(sorted(kwargs.items())))
+            try:
+                return _cache_get_or_load(tables, key, lambda: func(*args, **kwargs))
+            except sqlite3.Error as e:
+                print(f"⚠️  {func.__name__}: {e}")
+                return fallback()
+        return wrapper
+    return decorator
+
+# ==================== ESQUEMA E MIGRAÇÕES ====================
+
+# Cada migração roda uma única vez, em ordem, e grava seu número em PRAGMA user_version.
+# Migrações comuns rodam inteiras em uma transação. Migrações que precisam copiar muitas
+# linhas são geradores: cada `yield` confirma o lote atual e libera o lock de escrita.
+MIGRATION_BATCH_SIZE = int(os.environ.get("INDICA_MIGRATION_BATCH_SIZE", 5000))
+
+def _table_exists(conn, name):
+    """Verifica se uma tabela (ou tabela virtual) já existe"""
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,)).fetchone() is not None
 
-    # Tabela de usuários
-    cursor.execute('''
+def _trigger_exists(conn, name):
+    """Verifica se um trigger já existe"""
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = ?", (name,)
+    ).fetchone() is not None
+
+def _id_ranges(conn, table_name, batch_size=MIGRATION_BATCH_SIZE):
+    """Intervalos (início, fim] de ids para processar uma tabela em lotes"""
+    max_id = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table_name}").fetchone()[0]
+    for start in range(0, max_id, batch_size):
+        yield start, start + batch_size
+
+def _migration_base_schema(conn):
+    """Tabelas originais: usuários, grupos e recomendações"""
+    conn.execute('''
         CREATE TABLE IF NOT EXISTS users (
             username TEXT PRIMARY KEY,
             password TEXT NOT NULL,
@@ -20,9 +402,7 @@ def init_database():
             last_group INTEGER
         )
     ''')
-
-    # Tabela de grupos
-    cursor.execute('''
+    conn.execute('''
         CREATE TABLE IF NOT EXISTS groups (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             name TEXT NOT NULL UNIQUE,
@@ -34,9 +414,7 @@ def init_database():
             is_public BOOLEAN DEFAULT 1
         )
     ''')
-
-    # Tabela de recomendações
-    cursor.execute('''
+    conn.execute('''
         CREATE TABLE IF NOT EXISTS recommendations (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             title TEXT NOT NULL,
@@ -54,172 +432,1042 @@ def init_database():
         )
     ''')
 
-    conn.commit()
-    conn.close()
+def _migration_votes(conn):
+    """Tabela votes (um voto por usuário e recomendação), preenchida a partir de liked_by/disliked_by"""
+    # O trigger votes_after_insert só é criado depois do preenchimento: bancos anteriores ao
+    # controle de versão já o têm. Sem ele, o preenchimento (idempotente) roda de novo inteiro,
+    # inclusive se uma execução anterior desta migração parou no meio.
+    backfilled = _trigger_exists(conn, "votes_after_insert")
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS votes (
+            rec_id INTEGER NOT NULL,
+            username TEXT NOT NULL,
+            value INTEGER NOT NULL CHECK (value IN (1, -1)),
+            created_at TEXT NOT NULL,
+            PRIMARY KEY (rec_id, username)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_votes_username ON votes(username)")
+
+    if not backfilled:
+        yield
+        now = datetime.now().isoformat()
+        for start, end in _id_ranges(conn, "recommendations"):
+            for field, value in (("liked_by", 1), ("disliked_by", -1)):
+                conn.execute(f'''
+                    INSERT OR IGNORE INTO votes (rec_id, username, value, created_at)
+                    SELECT r.id, j.value, ?, ?
+                    FROM recommendations r, json_each(r.{field}) j
+                    WHERE r.id > ? AND r.id <= ? AND json_valid(r.{field})
+                ''', (value, now, start, end))
+            yield
+
+        # Recalcula os contadores a partir dos votos normalizados
+        for start, end in _id_ranges(conn, "recommendations"):
+            conn.execute('''
+                UPDATE recommendations SET
+                    likes = (SELECT COUNT(*) FROM votes v WHERE v.rec_id = recommendations.id AND v.value = 1),
+                    dislikes = (SELECT COUNT(*) FROM votes v WHERE v.rec_id = recommendations.id AND v.value = -1)
+                WHERE id > ? AND id <= ?
+            ''', (start, end))
+            yield
+
+    # Contadores de likes/dislikes mantidos pelo próprio SQLite
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS votes_after_insert AFTER INSERT ON votes BEGIN
+            UPDATE recommendations
+            SET likes = likes + (NEW.value = 1), dislikes = dislikes + (NEW.value = -1)
+            WHERE id = NEW.rec_id;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS votes_after_delete AFTER DELETE ON votes BEGIN
+            UPDATE recommendations
+            SET likes = likes - (OLD.value = 1), dislikes = dislikes - (OLD.value = -1)
+            WHERE id = OLD.rec_id;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS votes_after_update AFTER UPDATE OF value ON votes BEGIN
+            UPDATE recommendations
+            SET likes = likes - (OLD.value = 1) + (NEW.value = 1),
+                dislikes = dislikes - (OLD.value = -1) + (NEW.value = -1)
+            WHERE id = NEW.rec_id;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS recommendations_after_delete AFTER DELETE ON recommendations BEGIN
+            DELETE FROM votes WHERE rec_id = OLD.id;
+        END
+    ''')
+
+def _migration_recommendation_indexes(conn):
+    """Índices para consultas por grupo/autor e para as ordenações do feed (ver FEED_SORTS)"""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_recommendations_group ON recommendations(group_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_recommendations_author ON recommendations(author)")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_recommendations_group_created "
+        "ON recommendations(group_id, created_at)"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_recommendations_group_category_created "
+        "ON recommendations(group_id, category, created_at)"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_recommendations_group_likes "
+        "ON recommendations(group_id, likes)"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_recommendations_group_rating "
+        "ON recommendations(group_id, rating)"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_recommendations_group_controversy "
+        "ON recommendations(group_id, abs(likes - dislikes))"
+    )
+
+def _migration_search_index(conn):
+    """Índice FTS5 de título, descrição e tags, sincronizado por triggers"""
+    fts_exists = _table_exists(conn, "recommendations_fts")
+
+    try:
+        # remove_diacritics: "açaí" e "acai" encontram o mesmo documento
+        conn.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS recommendations_fts USING fts5(
+                title, description, tags,
+                content='recommendations', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2',
+                prefix='2 3'
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        print(f"⚠️  FTS5 indisponível, busca usará LIKE: {e}")
+        return
+
+    if not fts_exists:
+        conn.execute("INSERT INTO recommendations_fts(recommendations_fts) VALUES ('rebuild')")
+
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS recommendations_fts_after_insert AFTER INSERT ON recommendations BEGIN
+            INSERT INTO recommendations_fts(rowid, title, description, tags)
+            VALUES (NEW.id, NEW.title, NEW.description, NEW.tags);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS recommendations_fts_after_delete AFTER DELETE ON recommendations BEGIN
+            INSERT INTO recommendations_fts(recommendations_fts, rowid, title, description, tags)
+            VALUES ('delete', OLD.id, OLD.title, OLD.description, OLD.tags);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS recommendations_fts_after_update
+        AFTER UPDATE OF title, description, tags ON recommendations BEGIN
+            INSERT INTO recommendations_fts(recommendations_fts, rowid, title, description, tags)
+            VALUES ('delete', OLD.id, OLD.title, OLD.description, OLD.tags);
+            INSERT INTO recommendations_fts(rowid, title, description, tags)
+            VALUES (NEW.id, NEW.title, NEW.description, NEW.tags);
+        END
+    ''')
+
+def _migration_group_members(conn):
+    """Tabela group_members, preenchida a partir da lista JSON groups.members"""
+    # Como em _migration_votes, o trigger groups_after_delete marca o fim do preenchimento
+    backfilled = _trigger_exists(conn, "groups_after_delete")
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS group_members (
+            group_id INTEGER NOT NULL,
+            username TEXT NOT NULL,
+            joined_at TEXT NOT NULL,
+            PRIMARY KEY (group_id, username)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_group_members_username ON group_members(username, group_id)"
+    )
+
+    if not backfilled:
+        yield
+        for start, end in _id_ranges(conn, "groups"):
+            conn.execute('''
+                INSERT OR IGNORE INTO group_members (group_id, username, joined_at)
+                SELECT g.id, j.value, g.created_at
+                FROM groups g, json_each(g.members) j
+                WHERE g.id > ? AND g.id <= ? AND json_valid(g.members)
+            ''', (start, end))
+            yield
+
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS groups_after_delete AFTER DELETE ON groups BEGIN
+            DELETE FROM group_members WHERE group_id = OLD.id;
+        END
+    ''')
+
+def _migration_import_checkpoints(conn):
+    """Tabela de progresso das importações em lote (importer.py)"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS import_checkpoints (
+            source TEXT PRIMARY KEY,
+            table_name TEXT NOT NULL,
+            records INTEGER NOT NULL DEFAULT 0,
+            completed INTEGER NOT NULL DEFAULT 0,
+            updated_at TEXT NOT NULL
+        )
+    ''')
+
+def _migration_hot_score(conn):
+    """Coluna hot_score e índice para o ranking "Em alta" do feed"""
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(recommendations)")]
+    if "hot_score" not in columns:
+        conn.execute("ALTER TABLE recommendations ADD COLUMN hot_score REAL NOT NULL DEFAULT 0")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_recommendations_group_hot "
+        "ON recommendations(group_id, hot_score)"
+    )
+    yield
+
+    now = datetime.now().isoformat()
+    for start, end in _id_ranges(conn, "recommendations"):
+        conn.execute(
+            "UPDATE recommendations SET hot_score = hot_score(likes, dislikes, created_at, ?) "
+            "WHERE id > ? AND id <= ?",
+            (now, start, end)
+        )
+        yield
+
+def _stats_statements(row, sign):
+    """Comandos de trigger que somam (sign=1) ou retiram (sign=-1) a recomendação `row` das estatísticas"""
+    author = f"{row}.author"
+    category = f"COALESCE({row}.category, '')"
+    group_id = f"COALESCE({row}.group_id, 0)"
+    rating = f"COALESCE({row}.rating, 0)"
+    values = f"{sign}, {sign} * {row}.likes, {sign} * {row}.dislikes, {sign} * {rating}"
+    histogram = ", ".join(f"{sign} * ({rating} = {n})" for n in range(1, 6))
+    counters = ("total = total + excluded.total, likes = likes + excluded.likes, "
+                "dislikes = dislikes + excluded.dislikes, rating_sum = rating_sum + excluded.rating_sum")
+    histogram_counters = ", ".join(f"rating_{n} = rating_{n} + excluded.rating_{n}" for n in range(1, 6))
+    # Categorias e grupos distintos do autor mudam quando a linha filha aparece ou some
+    category_missing = (f"NOT EXISTS (SELECT 1 FROM user_category_stats "
+                        f"WHERE username = {author} AND category = {category})")
+    group_missing = (f"NOT EXISTS (SELECT 1 FROM user_group_stats "
+                     f"WHERE username = {author} AND group_id = {group_id})")
+    distinct_counters = [
+        f"UPDATE user_stats SET categories = categories + {sign} "
+        f"WHERE username = {author} AND {category} != '' AND {category_missing}",
+        f"UPDATE user_stats SET groups = groups + {sign} "
+        f"WHERE username = {author} AND {group_id} != 0 AND {group_missing}",
+    ]
+
+    statements = [
+        f"INSERT INTO user_stats (username, total, likes, dislikes, rating_sum) "
+        f"VALUES ({author}, {values}) ON CONFLICT(username) DO UPDATE SET {counters}",
+    ]
+    if sign > 0:
+        statements += distinct_counters
+    statements += [
+        f"INSERT INTO user_category_stats (username, category, total) VALUES ({author}, {category}, {sign}) "
+        f"ON CONFLICT(username, category) DO UPDATE SET total = total + excluded.total",
+        f"INSERT INTO user_group_stats (username, group_id, total) VALUES ({author}, {group_id}, {sign}) "
+        f"ON CONFLICT(username, group_id) DO UPDATE SET total = total + excluded.total",
+        f"INSERT INTO group_stats (group_id, total, likes, dislikes, rating_sum) VALUES ({group_id}, {values}) "
+        f"ON CONFLICT(group_id) DO UPDATE SET {counters}, version = version + 1",
+        f"INSERT INTO group_category_stats (group_id, category, total, likes, dislikes, rating_sum, "
+        f"rating_1, rating_2, rating_3, rating_4, rating_5) VALUES ({group_id}, {category}, {values}, {histogram}) "
+        f"ON CONFLICT(group_id, category) DO UPDATE SET {counters}, {histogram_counters}",
+    ]
+    if sign < 0:
+        statements += [
+            f"DELETE FROM user_category_stats WHERE username = {author} AND category = {category} AND total <= 0",
+            f"DELETE FROM user_group_stats WHERE username = {author} AND group_id = {group_id} AND total <= 0",
+            f"DELETE FROM group_category_stats WHERE group_id = {group_id} AND category = {category} AND total <= 0",
+        ] + distinct_counters
+    return "".join(f"    {statement};\n" for statement in statements)
+
+# Mesma linha para as estatísticas: só likes/dislikes mudaram (ver stats_after_vote)
+STATS_SAME_ROW = ("OLD.author IS NEW.author AND OLD.category IS NEW.category "
+                  "AND OLD.group_id IS NEW.group_id AND OLD.rating IS NEW.rating")
+
+def _recommendation_stats_triggers():
+    """Triggers que somam/retiram recomendações inseridas, removidas ou alteradas"""
+    return [
+        "CREATE TRIGGER IF NOT EXISTS stats_after_insert AFTER INSERT ON recommendations BEGIN\n"
+        f"{_stats_statements('NEW', 1)}END",
+        "CREATE TRIGGER IF NOT EXISTS stats_after_delete AFTER DELETE ON recommendations BEGIN\n"
+        f"{_stats_statements('OLD', -1)}END",
+        "CREATE TRIGGER IF NOT EXISTS stats_after_update "
+        "AFTER UPDATE OF author, category, group_id, rating ON recommendations "
+        f"WHEN NOT ({STATS_SAME_ROW}) BEGIN\n"
+        f"{_stats_statements('OLD', -1)}{_stats_statements('NEW', 1)}END",
+    ]
+
+def _migration_stats(conn):
+    """Estatísticas materializadas por usuário, grupo e categoria, mantidas por triggers"""
+    counters = '''
+            total INTEGER NOT NULL DEFAULT 0,
+            likes INTEGER NOT NULL DEFAULT 0,
+            dislikes INTEGER NOT NULL DEFAULT 0,
+            rating_sum INTEGER NOT NULL DEFAULT 0,'''
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS user_stats (
+            username TEXT PRIMARY KEY,{counters}
+            categories INTEGER NOT NULL DEFAULT 0,
+            groups INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS user_category_stats (
+            username TEXT NOT NULL,
+            category TEXT NOT NULL,
+            total INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (username, category)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS user_group_stats (
+            username TEXT NOT NULL,
+            group_id INTEGER NOT NULL,
+            total INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (username, group_id)
+        ) WITHOUT ROWID
+    ''')
+    # version muda a cada alteração no grupo (serve de chave de cache para as análises)
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS group_stats (
+            group_id INTEGER PRIMARY KEY,{counters}
+            members INTEGER NOT NULL DEFAULT 0,
+            version INTEGER NOT NULL DEFAULT 1
+        )
+    ''')
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS group_category_stats (
+            group_id INTEGER NOT NULL,
+            category TEXT NOT NULL,{counters}
+            rating_1 INTEGER NOT NULL DEFAULT 0,
+            rating_2 INTEGER NOT NULL DEFAULT 0,
+            rating_3 INTEGER NOT NULL DEFAULT 0,
+            rating_4 INTEGER NOT NULL DEFAULT 0,
+            rating_5 INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (group_id, category)
+        ) WITHOUT ROWID
+    ''')
+
+    # Estado inicial a partir dos dados existentes, em lotes de ids. Os triggers só são
+    # criados no fim: se a migração parar no meio, recomeça com as tabelas vazias
+    stats_tables = ("user_stats", "user_category_stats", "user_group_stats",
+                    "group_stats", "group_category_stats")
+    for table in stats_tables:
+        conn.execute(f"DELETE FROM {table}")
+    yield
+
+    rating = "COALESCE(rating, 0)"
+    counters = ("total = total + excluded.total, likes = likes + excluded.likes, "
+                "dislikes = dislikes + excluded.dislikes, rating_sum = rating_sum + excluded.rating_sum")
+    histogram = ", ".join(f"rating_{n} = rating_{n} + excluded.rating_{n}" for n in range(1, 6))
+    batch = "FROM recommendations WHERE id > ? AND id <= ?"
+    for start, end in _id_ranges(conn, "recommendations"):
+        for sql in (
+            f"INSERT INTO user_stats (username, total, likes, dislikes, rating_sum) "
+            f"SELECT author, COUNT(*), SUM(likes), SUM(dislikes), SUM({rating}) {batch} GROUP BY 1 "
+            f"ON CONFLICT(username) DO UPDATE SET {counters}",
+            f"INSERT INTO user_category_stats (username, category, total) "
+            f"SELECT author, COALESCE(category, ''), COUNT(*) {batch} GROUP BY 1, 2 "
+            f"ON CONFLICT(username, category) DO UPDATE SET total = total + excluded.total",
+            f"INSERT INTO user_group_stats (username, group_id, total) "
+            f"SELECT author, COALESCE(group_id, 0), COUNT(*) {batch} GROUP BY 1, 2 "
+            f"ON CONFLICT(username, group_id) DO UPDATE SET total = total + excluded.total",
+            f"INSERT INTO group_stats (group_id, total, likes, dislikes, rating_sum) "
+            f"SELECT COALESCE(group_id, 0), COUNT(*), SUM(likes), SUM(dislikes), SUM({rating}) {batch} GROUP BY 1 "
+            f"ON CONFLICT(group_id) DO UPDATE SET {counters}",
+            f"INSERT INTO group_category_stats SELECT COALESCE(group_id, 0), COALESCE(category, ''), "
+            f"COUNT(*), SUM(likes), SUM(dislikes), SUM({rating}), "
+            + ", ".join(f"SUM({rating} = {n})" for n in range(1, 6)) +
+            f" {batch} GROUP BY 1, 2 ON CONFLICT(group_id, category) DO UPDATE SET {counters}, {histogram}",
+        ):
+            conn.execute(sql, (start, end))
+        yield
+
+    for start, end in _id_ranges(conn, "groups"):
+        conn.execute('''
+            INSERT INTO group_stats (group_id, members)
+            SELECT group_id, COUNT(*) FROM group_members WHERE group_id > ? AND group_id <= ? GROUP BY group_id
+            ON CONFLICT(group_id) DO UPDATE SET members = excluded.members
+        ''', (start, end))
+        yield
+
+    # Categorias e grupos distintos de cada autor, a partir das contagens já somadas
+    conn.execute('''
+        UPDATE user_stats SET
+            categories = (SELECT COUNT(*) FROM user_category_stats c
+                          WHERE c.username = user_stats.username AND c.category != ''),
+            groups = (SELECT COUNT(*) FROM user_group_stats g
+                      WHERE g.username = user_stats.username AND g.group_id != 0)
+    ''')
+
+    for sql in _recommendation_stats_triggers():
+        conn.execute(sql)
+
+    # Um voto só muda likes/dislikes: ajusta os contadores no lugar
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS stats_after_vote
+        AFTER UPDATE OF likes, dislikes ON recommendations WHEN {STATS_SAME_ROW} BEGIN
+            UPDATE user_stats SET likes = likes + NEW.likes - OLD.likes,
+                                  dislikes = dislikes + NEW.dislikes - OLD.dislikes
+            WHERE username = NEW.author;
+            UPDATE group_stats SET likes = likes + NEW.likes - OLD.likes,
+                                   dislikes = dislikes + NEW.dislikes - OLD.dislikes,
+                                   version = version + 1
+            WHERE group_id = COALESCE(NEW.group_id, 0);
+            UPDATE group_category_stats SET likes = likes + NEW.likes - OLD.likes,
+                                            dislikes = dislikes + NEW.dislikes - OLD.dislikes
+            WHERE group_id = COALESCE(NEW.group_id, 0) AND category = COALESCE(NEW.category, '');
+        END
+    ''')
+
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS stats_after_member_insert AFTER INSERT ON group_members BEGIN
+            INSERT INTO group_stats (group_id, members) VALUES (NEW.group_id, 1)
+            ON CONFLICT(group_id) DO UPDATE SET members = members + 1, version = version + 1;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS stats_after_member_delete AFTER DELETE ON group_members BEGIN
+            UPDATE group_stats SET members = members - 1, version = version + 1
+            WHERE group_id = OLD.group_id;
+        END
+    ''')
+
+def _migration_group_name_index(conn):
+    """Nomes de grupo únicos sem diferenciar maiúsculas (duplicatas antigas ganham o id no nome)"""
+    while True:
+        renamed = conn.execute(
+            "UPDATE groups SET name = name || ' #' || id "
+            "WHERE id NOT IN (SELECT MIN(id) FROM groups GROUP BY name COLLATE NOCASE)"
+        ).rowcount
+        if not renamed:
+            break
+        print(f"⚠️  {renamed} grupo(s) com nome repetido renomeado(s)")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_groups_name_nocase ON groups(name COLLATE NOCASE)")
+
+def _migration_search_tags(conn):
+    """Tags regravadas em UTF-8 (sem escapes \\uXXXX), para a busca encontrar termos acentuados"""
+    # Os triggers de recommendations_fts reindexam cada linha alterada
+    for start, end in _id_ranges(conn, "recommendations"):
+        rows = conn.execute(
+            "SELECT id, tags FROM recommendations WHERE id > ? AND id <= ? AND instr(tags, '\\u') > 0",
+            (start, end)
+        ).fetchall()
+        updates = []
+        for rec_id, tags in rows:
+            try:
+                updates.append((to_json(json.loads(tags)), rec_id))
+            except ValueError:
+                continue
+        conn.executemany("UPDATE recommendations SET tags = ? WHERE id = ?", updates)
+        yield
+
+def _migration_hot_score_reference(conn):
+    """Instante de referência único para o ranking "Em alta" (ver HOT_SCORE_UPDATE)"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS hot_score_reference (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            reference TEXT NOT NULL
+        )
+    ''')
+    conn.execute(
+        "INSERT OR REPLACE INTO hot_score_reference (id, reference) VALUES (1, ?)",
+        (datetime.now().isoformat(),)
+    )
+    yield
+
+    # Recalcula tudo na nova referência (se a migração for interrompida, recomeça do zero)
+    for start, end in _id_ranges(conn, "recommendations"):
+        conn.execute(f"{HOT_SCORE_UPDATE} WHERE id > ? AND id <= ?", (start, end))
+        yield
+
+def _migration_stats_null_rating(conn):
+    """Triggers de estatísticas contam nota NULL como 0 (antes a inserção falhava)"""
+    for name in ("stats_after_insert", "stats_after_delete", "stats_after_update"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+    for sql in _recommendation_stats_triggers():
+        conn.execute(sql)
+
+MIGRATIONS = [
+    (1, _migration_base_schema),
+    (2, _migration_votes),
+    (3, _migration_recommendation_indexes),
+    (4, _migration_search_index),
+    (5, _migration_group_members),
+    (6, _migration_import_checkpoints),
+    (7, _migration_hot_score),
+    (8, _migration_stats),
+    (9, _migration_group_name_index),
+    (10, _migration_search_tags),
+    (11, _migration_hot_score_reference),
+    (12, _migration_stats_null_rating),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def _run_migration(conn, version, migration):
+    """Roda uma migração; se for um gerador, confirma um lote a cada yield"""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        steps = migration(conn)
+        if inspect.isgenerator(steps):
+            for _ in steps:
+                conn.commit()
+                conn.execute("BEGIN IMMEDIATE")
+        conn.execute(f"PRAGMA user_version = {version:d}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+def init_database():
+    """Inicializa o banco de dados SQLite, aplicando as migrações pendentes"""
+    global FTS_ENABLED
+
+    conn = _acquire_connection()
+    try:
+        current = conn.execute("PRAGMA user_version").fetchone()[0]
+        if current < SCHEMA_VERSION:
+            for version, migration in MIGRATIONS:
+                if version > current:
+                    _run_migration(conn, version, migration)
+                    print(f"✅ Migração {version} aplicada: {migration.__doc__}")
+
+        FTS_ENABLED = _table_exists(conn, "recommendations_fts")
+    finally:
+        _release_connection(conn)
+
+# ==================== ESCRITA POR LINHA ====================
+
+# Colunas aceitas por tabela (também servem de whitelist para os nomes interpolados no SQL)
+TABLE_COLUMNS = {
+    "users": ["username", "password", "created_at", "preferred_group", "last_group"],
+    "groups": ["id", "name", "description", "categories", "created_by", "created_at",
+               "members", "is_public"],
+    "recommendations": ["id", "title", "description", "category", "rating", "tags", "author",
+                        "group_id", "created_at", "likes", "dislikes", "liked_by", "disliked_by",
+                        "hot_score"]
+}
+
+PRIMARY_KEYS = {
+    "users": "username",
+    "groups": "id",
+    "recommendations": "id"
+}
+
+JSON_FIELDS = {
+    "groups": ["categories", "members"],
+    "recommendations": ["tags", "liked_by", "disliked_by"]
+}
+
+def to_json(value):
+    """Lista gravada como JSON em UTF-8 (sem escapes \\uXXXX, para que a busca veja os acentos)"""
+    return json.dumps(value if value is not None else [], ensure_ascii=False)
+
+# Tabelas em cache alteradas pelos triggers de uma escrita, além da própria tabela.
+# As estatísticas (group_stats etc.) são lidas em cache junto com a tabela de origem
+TRIGGER_CASCADES = {
+    ("delete", "groups"): ("group_members",),  # groups_after_delete
+}
+
+def _touched_tables(operation, table_name):
+    """Tabelas cujo cache uma escrita em table_name invalida"""
+    return (table_name,) + TRIGGER_CASCADES.get((operation, table_name), ())
+
+def _check_columns(table_name, columns):
+    """Garante que as colunas existem antes de montar o SQL"""
+    unknown = [c for c in columns if c not in TABLE_COLUMNS[table_name]]
+    if unknown:
+        raise ValueError(f"Colunas desconhecidas em {table_name}: {', '.join(unknown)}")
+
+def _serialize_value(table_name, column, value):
+    """Converte um valor Python para o formato gravado no SQLite"""
+    if column in JSON_FIELDS.get(table_name, []):
+        return to_json(value)
+    if column == "is_public":
+        return 1 if value else 0
+    return value
 
-def load_data(table_name, default=None):
-    """Carrega dados de uma tabela - mantém compatibilidade"""
-    if default is None:
-        default = [] if table_name != "users" else {}
+def insert_row(table_name, item):
+    """Insere uma única linha e retorna o id gerado (ou None em caso de erro)"""
+    table_name = resolve_table(table_name)
+    columns = [c for c in TABLE_COLUMNS[table_name] if c in item]
+    _check_columns(table_name, columns)
+    values = [_serialize_value(table_name, c, item[c]) for c in columns]
+    sql = f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+    # Recomendações novas entram no ranking com a mesma referência das demais
+    rescore = table_name == "recommendations" and "hot_score" not in item
 
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+    def insert(conn):
+        row_id = conn.execute(sql, values).lastrowid
+        if rescore:
+            conn.execute(f"{HOT_SCORE_UPDATE} WHERE id = ?", (row_id,))
+        return row_id
 
     try:
-        cursor.execute(f"SELECT * FROM {table_name}")
+        return _write(insert, tables=_touched_tables("insert", table_name))
+    except Exception as e:
+        print(f"❌ Erro ao inserir em {table_name}: {e}")
+        return None
+
+def update_row(table_name, row_id, fields):
+    """Atualiza apenas os campos informados de uma linha, localizada pela chave primária"""
+    table_name = resolve_table(table_name)
+    columns = list(fields)
+    _check_columns(table_name, columns)
+    if not columns:
+        return False
+    values = [_serialize_value(table_name, c, fields[c]) for c in columns]
+    sql = (f"UPDATE {table_name} SET {', '.join(f'{c} = ?' for c in columns)} "
+           f"WHERE {PRIMARY_KEYS[table_name]} = ?")
+
+    try:
+        return _write(
+            lambda conn: conn.execute(sql, values + [row_id]).rowcount > 0,
+            tables=_touched_tables("update", table_name)
+        )
+    except Exception as e:
+        print(f"❌ Erro ao atualizar {table_name}: {e}")
+        return False
+
+def delete_row(table_name, row_id):
+    """Remove uma única linha pela chave primária"""
+    table_name = resolve_table(table_name)
+    sql = f"DELETE FROM {table_name} WHERE {PRIMARY_KEYS[table_name]} = ?"
+
+    try:
+        return _write(
+            lambda conn: conn.execute(sql, (row_id,)).rowcount > 0,
+            tables=_touched_tables("delete", table_name)
+        )
+    except Exception as e:
+        print(f"❌ Erro ao remover de {table_name}: {e}")
+        return False
+
+# ==================== CONSULTAS ====================
+
+def _row_to_item(table_name, columns, row):
+    """Converte uma linha do SQLite no dicionário usado pelo app"""
+    item = dict(zip(columns, row))
+
+    # Converte campos JSON para lista
+    for field in JSON_FIELDS.get(table_name, []):
+        if field in item and item[field]:
+            try:
+                item[field] = json.loads(item[field])
+            except:
+                item[field] = []
+        elif field in item:
+            item[field] = []
+
+    # Converte tipos
+    if 'id' in item:
+        item['id'] = int(item['id'])
+    if 'rating' in item:
+        item['rating'] = int(item['rating']) if item['rating'] else 0
+    if 'likes' in item:
+        item['likes'] = int(item['likes']) if item['likes'] else 0
+    if 'dislikes' in item:
+        item['dislikes'] = int(item['dislikes']) if item['dislikes'] else 0
+    if 'group_id' in item:
+        item['group_id'] = int(item['group_id']) if item['group_id'] else 0
+    if 'is_public' in item:
+        item['is_public'] = bool(item['is_public'])
+
+    return item
+
+def _query(table_name, sql, params=()):
+    """Executa um SELECT e converte as linhas com _row_to_item"""
+    conn = _acquire_connection()
+    try:
+        cursor = conn.execute(sql, params)
         columns = [description[0] for description in cursor.description]
-        rows = cursor.fetchall()
-
-        if table_name == "users":
-            data = {}
-            for row in rows:
-                user_data = {
-                    "password": row[1],
-                    "created_at": row[2],
-                    "preferred_group": row[3],
-                    "last_group": row[4]
-                }
-                data[row[0]] = user_data
+        return [_row_to_item(table_name, columns, row) for row in cursor.fetchall()]
+    finally:
+        _release_connection(conn)
+
+def _fetchall(sql, params=()):
+    """Executa um SELECT e devolve as tuplas sem conversão"""
+    conn = _acquire_connection()
+    try:
+        return conn.execute(sql, params).fetchall()
+    finally:
+        _release_connection(conn)
+
+def get_user(username):
+    """Dados de um usuário, ou None se não existir (sem cache: usado no login)"""
+    try:
+        rows = _query("users", "SELECT * FROM users WHERE username = ?", (username,))
+    except sqlite3.Error as e:
+        print(f"⚠️  Carregando usuário: {e}")
+        return None
+    return rows[0] if rows else None
+
+# Colunas de grupo devolvidas pela API; member_count vem de group_members
+GROUP_SELECT = (
+    "SELECT g.id, g.name, g.description, g.categories, g.created_by, g.created_at, g.is_public, "
+    "COALESCE((SELECT s.members FROM group_stats s WHERE s.group_id = g.id), 0) AS member_count "
+    "FROM groups g"
+)
+
+@cached_read("groups", "group_members", fallback=lambda: None)
+def get_group(group_id):
+    """Um grupo pelo id, ou None se não existir"""
+    rows = _query("groups", f"{GROUP_SELECT} WHERE g.id = ?", (group_id,))
+    return rows[0] if rows else None
+
+@cached_read("recommendations", fallback=lambda: None)
+def get_recommendation(rec_id):
+    """Uma recomendação pelo id, ou None se não existir"""
+    rows = _query("recommendations", "SELECT * FROM recommendations WHERE id = ?", (rec_id,))
+    return rows[0] if rows else None
+
+@cached_read("recommendations", "groups")
+def get_user_recommendations(username):
+    """Recomendações criadas por um usuário, já com o nome do grupo (usa idx_recommendations_author)"""
+    return _query(
+        "recommendations",
+        "SELECT r.*, g.name AS group_name FROM recommendations r "
+        "LEFT JOIN groups g ON g.id = r.group_id "
+        "WHERE r.author = ? ORDER BY r.created_at DESC",
+        (username,)
+    )
+
+@cached_read("recommendations", fallback=dict)
+def get_user_recommendation_stats(username):
+    """Métricas agregadas das recomendações de um usuário (uma linha de user_stats)"""
+    rows = _fetchall(
+        "SELECT total, likes, dislikes, rating_sum, categories, groups FROM user_stats WHERE username = ?",
+        (username,)
+    )
+    total, likes, dislikes, rating_sum, categories, groups = rows[0] if rows else (0, 0, 0, 0, 0, 0)
+    return {
+        "total": total,
+        "likes": likes,
+        "dislikes": dislikes,
+        "avg_rating": rating_sum / total if total else 0,
+        "categories": categories,
+        "groups": groups
+    }
+
+def group_version(conn, group_id):
+    """Versão atual do grupo em group_stats (0 se ainda não houver linha), lida na conexão dada"""
+    row = conn.execute("SELECT version FROM group_stats WHERE group_id = ?", (group_id,)).fetchone()
+    return row[0] if row else 0
+
+@cached_read("recommendations", "group_members", fallback=dict)
+def get_group_stats(group_id):
+    """Totais de um grupo (uma linha de group_stats); version muda a cada alteração no grupo"""
+    rows = _fetchall(
+        "SELECT total, likes, dislikes, rating_sum, members, version FROM group_stats WHERE group_id = ?",
+        (group_id,)
+    )
+    total, likes, dislikes, rating_sum, members, version = rows[0] if rows else (0, 0, 0, 0, 0, 0)
+    return {
+        "total": total,
+        "likes": likes,
+        "dislikes": dislikes,
+        "avg_rating": rating_sum / total if total else 0,
+        "members": members,
+        "version": version
+    }
+
+# Ordenações do feed; cada uma é atendida por um índice começando em group_id
+FEED_SORTS = {
+    "recent": "created_at DESC, id DESC",
+    "hot": "hot_score DESC, id DESC",
+    "likes": "likes DESC, id DESC",
+    "rating": "rating DESC, id DESC",
+    "controversial": "abs(likes - dislikes) ASC, id DESC"
+}
+
+FEED_PAGE_SIZE = 20
+
+# Colunas da linha de resumo do feed; descrição e tags vêm de get_recommendation
+FEED_COLUMNS = "r.id, r.title, r.category, r.rating, r.author, r.group_id, r.created_at, r.likes, r.dislikes"
+
+# Busca textual (FTS5); se o SQLite não tiver FTS5, a busca cai para LIKE
+FTS_ENABLED = False
+
+def fold_text(text):
+    """Minúsculas sem acentos ("Ficção" -> "ficcao"); o lower() do SQLite só trata ASCII"""
+    if not isinstance(text, str):
+        return text
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+def _escape_like(term):
+    """Escapa curingas do LIKE para busca literal"""
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def _fts_match_expression(search):
+    """Transforma o texto digitado em uma consulta FTS5 com prefixo: "filme"* "terror"*"""
+    terms = re.findall(r"\w+", search)
+    return " ".join(f'"{term}"*' for term in terms) or None
+
+def _feed_source(group_id, category=None, search=None):
+    """Monta FROM/WHERE compartilhados pelo feed e pela contagem.
+
+    Retorna (sql, params, ranked); ranked indica que a busca FTS5 foi usada
+    e os resultados devem ser ordenados por relevância (bm25).
+    """
+    where = ["r.group_id = ?"]
+    params = [group_id]
+    source = "recommendations r"
+    ranked = False
+
+    if search:
+        match = _fts_match_expression(search) if FTS_ENABLED else None
+        if match:
+            source = "recommendations_fts JOIN recommendations r ON r.id = recommendations_fts.rowid"
+            where.insert(0, "recommendations_fts MATCH ?")
+            params.insert(0, match)
+            ranked = True
+        elif not FTS_ENABLED:
+            pattern = f"%{_escape_like(fold_text(search))}%"
+            where.append(
+                "(fold(r.title) LIKE ? ESCAPE '\\' OR fold(r.description) LIKE ? ESCAPE '\\' "
+                "OR fold(r.tags) LIKE ? ESCAPE '\\')"
+            )
+            params.extend([pattern, pattern, pattern])
+
+    if category:
+        where.append("r.category = ?")
+        params.append(category)
+
+    return f"FROM {source} WHERE {' AND '.join(where)}", params, ranked
+
+@cached_read("recommendations")
+def get_group_feed(group_id, category=None, sort_by="recent", page=1,
+                   page_size=FEED_PAGE_SIZE, search=None):
+    """Retorna uma página do feed do grupo.
+
+    Filtro de categoria, busca, ordenação e paginação são feitos pelo SQLite,
+    então o custo depende do tamanho da página e não do tamanho do grupo.
+    Com busca, os resultados vêm do índice FTS5 ordenados por relevância e sort_by é ignorado.
+    Use count_group_recommendations com os mesmos filtros para o total de páginas.
+    Cada item traz só as colunas de FEED_COLUMNS.
+    """
+    if sort_by not in FEED_SORTS:
+        raise ValueError(f"Ordenação desconhecida: {sort_by}")
+
+    source, params, ranked = _feed_source(group_id, category, search)
+    # Título pesa mais que tags, que pesam mais que a descrição
+    order = "bm25(recommendations_fts, 10.0, 1.0, 5.0)" if ranked else FEED_SORTS[sort_by]
+    page = max(int(page), 1)
+
+    return _query(
+        "recommendations",
+        f"SELECT {FEED_COLUMNS} {source} ORDER BY {order} LIMIT ? OFFSET ?",
+        params + [page_size, (page - 1) * page_size]
+    )
+
+@cached_read("recommendations", fallback=int)
+def count_group_recommendations(group_id, category=None, search=None):
+    """Conta as recomendações de um grupo, opcionalmente filtradas"""
+    if not search:
+        # Sem busca textual o total já está materializado
+        if category:
+            sql, params = ("SELECT total FROM group_category_stats WHERE group_id = ? AND category = ?",
+                           (group_id, category))
         else:
-            data = []
-            for row in rows:
-                item = dict(zip(columns, row))
-
-                # Converte campos JSON para lista
-                json_fields = []
-                if table_name == "groups":
-                    json_fields = ['categories', 'members']
-                elif table_name == "recommendations":
-                    json_fields = ['tags', 'liked_by', 'disliked_by']
-
-                for field in json_fields:
-                    if field in item and item[field]:
-                        try:
-                            item[field] = json.loads(item[field])
-                        except:
-                            item[field] = []
-                    elif field in item:
-                        item[field] = []
-
-                # Converte tipos
-                if 'id' in item:
-                    item['id'] = int(item['id'])
-                if 'rating' in item:
-                    item['rating'] = int(item['rating']) if item['rating'] else 0
-                if 'likes' in item:
-                    item['likes'] = int(item['likes']) if item['likes'] else 0
-                if 'dislikes' in item:
-                    item['dislikes'] = int(item['dislikes']) if item['dislikes'] else 0
-                if 'group_id' in item:
-                    item['group_id'] = int(item['group_id']) if item['group_id'] else 0
-                if 'is_public' in item:
-                    item['is_public'] = bool(item['is_public'])
-
-                data.append(item)
-
-        return data
+            sql, params = "SELECT total FROM group_stats WHERE group_id = ?", (group_id,)
+        rows = _fetchall(sql, params)
+        return rows[0][0] if rows else 0
+    source, params, _ = _feed_source(group_id, category, search)
+    return _fetchall(f"SELECT COUNT(*) {source}", params)[0][0]
+
+@cached_read("recommendations")
+def get_group_categories(group_id):
+    """Categorias distintas usadas nas recomendações de um grupo"""
+    rows = _fetchall(
+        "SELECT category FROM group_category_stats WHERE group_id = ? AND category != '' ORDER BY category",
+        (group_id,)
+    )
+    return [row[0] for row in rows]
+
+# ==================== MEMBROS DE GRUPOS ====================
+
+def _create_group(conn, name, description, categories, created_by, is_public, created_at):
+    group_id = conn.execute(
+        "INSERT INTO groups (name, description, categories, created_by, created_at, members, is_public) "
+        "VALUES (?, ?, ?, ?, ?, '[]', ?) RETURNING id",
+        (name, description, to_json(categories), created_by, created_at, 1 if is_public else 0)
+    ).fetchone()[0]
+    conn.execute(
+        "INSERT INTO group_members (group_id, username, joined_at) VALUES (?, ?, ?)",
+        (group_id, created_by, created_at)
+    )
+    conn.execute(
+        "UPDATE users SET preferred_group = ?, last_group = ? WHERE username = ?",
+        (group_id, group_id, created_by)
+    )
+    return group_id
+
+def create_group(name, description, categories, created_by, is_public=True):
+    """Cria o grupo com o criador como membro e grupo atual, tudo em uma transação; retorna o id.
+
+    O id vem do SQLite (AUTOINCREMENT). Um nome já usado, sem diferenciar maiúsculas,
+    é recusado por idx_groups_name_nocase com sqlite3.IntegrityError.
+    """
+    return _write(
+        _create_group, name, description, categories, created_by, is_public, datetime.now().isoformat(),
+        tables=("groups", "group_members", "users")
+    )
+
+@cached_read("groups", "group_members")
+def get_user_groups(username):
+    """Grupos de um usuário, na ordem em que entrou (usa idx_group_members_username)"""
+    return _query(
+        "groups",
+        f"{GROUP_SELECT} JOIN group_members m ON m.group_id = g.id "
+        "WHERE m.username = ? ORDER BY m.joined_at, g.id",
+        (username,)
+    )
+
+@cached_read("groups", "group_members")
+def get_public_groups(username):
+    """Grupos públicos dos quais o usuário ainda não participa"""
+    return _query(
+        "groups",
+        f"{GROUP_SELECT} WHERE g.is_public = 1 AND NOT EXISTS ("
+        "SELECT 1 FROM group_members m WHERE m.group_id = g.id AND m.username = ?"
+        ") ORDER BY g.id",
+        (username,)
+    )
+
+@cached_read("group_members")
+def get_group_members(group_id):
+    """Nomes dos membros de um grupo, na ordem de entrada"""
+    rows = _fetchall(
+        "SELECT username FROM group_members WHERE group_id = ? ORDER BY joined_at, username",
+        (group_id,)
+    )
+    return [row[0] for row in rows]
+
+@cached_read("group_members", fallback=bool)
+def is_group_member(group_id, username):
+    """Verifica a participação pela chave primária de group_members"""
+    return bool(_fetchall(
+        "SELECT 1 FROM group_members WHERE group_id = ? AND username = ?", (group_id, username)
+    ))
+
+def add_group_member(group_id, username):
+    """Entra no grupo; retorna False se o usuário já era membro ou em caso de erro"""
+    try:
+        return _write(lambda conn: conn.execute(
+            "INSERT OR IGNORE INTO group_members (group_id, username, joined_at) VALUES (?, ?, ?)",
+            (group_id, username, datetime.now().isoformat())
+        ).rowcount > 0, tables=("group_members",))
     except Exception as e:
-        print(f"⚠️  Carregando {table_name}: {e}")
-        return default
-    finally:
-        conn.close()
+        print(f"❌ Erro ao entrar no grupo: {e}")
+        return False
 
-def save_data(table_name, data):
-    """Salva dados em uma tabela - mantém compatibilidade"""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-
-    try:
-        if table_name == "users":
-            for username, user_data in data.items():
-                cursor.execute('''
-                    INSERT OR REPLACE INTO users
-                    (username, password, created_at, preferred_group, last_group)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (
-                    username,
-                    user_data.get('password', ''),
-                    user_data.get('created_at', datetime.now().isoformat()),
-                    user_data.get('preferred_group'),
-                    user_data.get('last_group')
-                ))
-
-        elif table_name == "groups":
-            cursor.execute("DELETE FROM groups")
-            for item in data:
-                cursor.execute('''
-                    INSERT INTO groups
-                    (id, name, description, categories, created_by, created_at, members, is_public)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    item.get('id'),
-                    item.get('name', ''),
-                    item.get('description', ''),
-                    json.dumps(item.get('categories', [])),
-                    item.get('created_by', ''),
-                    item.get('created_at', datetime.now().isoformat()),
-                    json.dumps(item.get('members', [])),
-                    1 if item.get('is_public', True) else 0
-                ))
-
-        elif table_name == "recommendations":
-            cursor.execute("DELETE FROM recommendations")
-            for item in data:
-                cursor.execute('''
-                    INSERT INTO recommendations
-                    (id, title, description, category, rating, tags, author, group_id, created_at, likes, dislikes, liked_by, disliked_by)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    item.get('id'),
-                    item.get('title', ''),
-                    item.get('description', ''),
-                    item.get('category', ''),
-                    item.get('rating', 0),
-                    json.dumps(item.get('tags', [])),
-                    item.get('author', ''),
-                    item.get('group_id', 0),
-                    item.get('created_at', datetime.now().isoformat()),
-                    item.get('likes', 0),
-                    item.get('dislikes', 0),
-                    json.dumps(item.get('liked_by', [])),
-                    json.dumps(item.get('disliked_by', []))
-                ))
+def remove_group_member(group_id, username):
+    """Sai do grupo; retorna False se o usuário não era membro ou em caso de erro"""
+    try:
+        return _write(lambda conn: conn.execute(
+            "DELETE FROM group_members WHERE group_id = ? AND username = ?", (group_id, username)
+        ).rowcount > 0, tables=("group_members",))
+    except Exception as e:
+        print(f"❌ Erro ao sair do grupo: {e}")
+        return False
 
-        conn.commit()
-        return True
+# ==================== VOTOS ====================
+
+def _toggle_vote(conn, rec_id, username, value):
+    if conn.execute("SELECT 1 FROM recommendations WHERE id = ?", (rec_id,)).fetchone() is None:
+        return False
+
+    row = conn.execute(
+        "SELECT value FROM votes WHERE rec_id = ? AND username = ?",
+        (rec_id, username)
+    ).fetchone()
+
+    if row is None:
+        conn.execute(
+            "INSERT INTO votes (rec_id, username, value, created_at) VALUES (?, ?, ?, ?)",
+            (rec_id, username, value, datetime.now().isoformat())
+        )
+    elif row[0] == value:
+        conn.execute("DELETE FROM votes WHERE rec_id = ? AND username = ?", (rec_id, username))
+    else:
+        conn.execute(
+            "UPDATE votes SET value = ? WHERE rec_id = ? AND username = ?",
+            (value, rec_id, username)
+        )
+
+    # Atualiza o ranking só desta recomendação, na mesma transação do voto
+    conn.execute(f"{HOT_SCORE_UPDATE} WHERE id = ?", (rec_id,))
+    return True
+
+def toggle_vote(rec_id, username, value):
+    """Registra like (1) ou dislike (-1) de forma atômica.
 
+    Votar de novo no mesmo valor remove o voto; votar no valor oposto troca o voto.
+    Os contadores likes/dislikes são ajustados pelos triggers da tabela votes.
+    """
+    if value not in (1, -1):
+        raise ValueError(f"Valor de voto inválido: {value}")
+
+    try:
+        return _write(_toggle_vote, rec_id, username, value, tables=("recommendations",))
     except Exception as e:
-        print(f"❌ Erro ao salvar {table_name}: {e}")
+        print(f"❌ Erro ao registrar voto: {e}")
         return False
 
-    finally:
-        conn.close()
+def refresh_hot_scores(batch_size=MIGRATION_BATCH_SIZE):
+    """Avança a referência do ranking para agora e recalcula hot_score de todas as recomendações em lotes"""
+    with connection() as conn:
+        ranges = list(_id_ranges(conn, "recommendations", batch_size))
+
+    # Enquanto os lotes não terminam, as linhas ainda não recalculadas ficam na referência anterior
+    _write(lambda conn: conn.execute(
+        "UPDATE hot_score_reference SET reference = ?", (datetime.now().isoformat(),)
+    ))
+    # Um lote de cada vez: o próximo só entra na fila depois do COMMIT do anterior, então as
+    # escritas do app que chegarem nesse meio tempo são gravadas entre um lote e outro
+    for start, end in ranges:
+        _write(lambda conn: conn.execute(
+            f"{HOT_SCORE_UPDATE} WHERE id > ? AND id <= ?", (start, end)
+        ), tables=("recommendations",))
+
+def _hot_score_refresher(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            refresh_hot_scores()
+        except Exception as e:
+            print(f"⚠️  Atualizando ranking Em alta: {e}")
+
+def start_hot_score_refresher(interval=HOT_REFRESH_SECONDS):
+    """Inicia a thread que reaplica o decaimento do ranking a cada interval segundos"""
+    thread = threading.Thread(
+        target=_hot_score_refresher, args=(interval,), name="hot-score-refresher", daemon=True
+    )
+    thread.start()
+    return thread
 
 # Funções auxiliares para compatibilidade
 def save_user_preferred_group(username, group_id):
-    users = load_data("users", {})
-    if username in users:
-        users[username]["preferred_group"] = group_id
-        users[username]["last_group"] = group_id
-        save_data("users", users)
-        return True
-    return False
+    """Grava o grupo preferido/último grupo do usuário (um UPDATE pela chave primária)"""
+    return update_row("users", username, {"preferred_group": group_id, "last_group": group_id})
 
 def get_user_preferred_group(username):
-    users = load_data("users", {})
-    if username in users:
-        return users[username].get("preferred_group")
-    return None
+    user = get_user(username)
+    return user.get("preferred_group") if user else None
 
 def get_user_last_group(username):
-    users = load_data("users", {})
-    if username in users:
-        return users[username].get("last_group")
-    return None
+    user = get_user(username)
+    return user.get("last_group") if user else None
 
 # Migra dados antigos se existirem
 def migrate_old_data():
-    """Migra dados dos arquivos JSON antigos para o SQLite"""
+    """Migra dados dos arquivos JSON antigos para o SQLite (via importer.py)"""
     old_files = {
         "users.json": "users",
         "groups.json": "groups",
@@ -229,18 +1477,32 @@ def migrate_old_data():
     for filename, table_name in old_files.items():
         if os.path.exists(f"data/{filename}"):
             try:
-                with open(f"data/{filename}", 'r', encoding='utf-8') as f:
-                    old_data = json.load(f)
-
-                if old_data:
-                    save_data(table_name, old_data)
-                    print(f"✅ Migrados dados de {filename}")
+                from importer import import_file
+                import_file(f"data/{filename}", table_name, quiet=True)
+                print(f"✅ Migrados dados de {filename}")
 
-                    # Renomeia arquivo antigo para backup
-                    os.rename(f"data/{filename}", f"data/{filename}.backup")
+                # Renomeia arquivo antigo para backup
+                os.rename(f"data/{filename}", f"data/{filename}.backup")
             except Exception as e:
                 print(f"⚠️  Não foi possível migrar {filename}: {e}")
 
-# Inicializa o banco e migra dados
-init_database()
-migrate_old_data()
+# ==================== INICIALIZAÇÃO ====================
+
+_bootstrap_lock = threading.Lock()
+_bootstrapped = False
+
+def bootstrap():
+    """Prepara o banco uma vez por processo: migrações pendentes e dados JSON antigos.
+
+    Chamadas seguintes (ex.: cada rerun do Streamlit) retornam sem tocar no banco.
+    """
+    global _bootstrapped
+    if _bootstrapped:
+        return
+    with _bootstrap_lock:
+        if not _bootstrapped:
+            init_database()
+            migrate_old_data()
+            if HOT_REFRESH_SECONDS > 0:
+                start_hot_score_refresher()
+            _bootstrapped = True